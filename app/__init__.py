@@ -29,6 +29,37 @@ def create_app():
     
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['SQLALCHEMY_DATABASE_URI']
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Dashboard: precálculo de las respuestas por año y tiempo de cache HTTP (segundos).
+    # El precálculo se hace en la primera petición al dashboard que atiende el proceso, nunca en
+    # create_app(): los comandos y workers que no sirven el dashboard no cargan pandas.
+    # Con 0, cada endpoint calcula solo su dataset cuando se lo pide.
+    app.config['DASHBOARD_PRECALCULAR'] = os.getenv('DASHBOARD_PRECALCULAR', '1') == '1'
+    app.config['DASHBOARD_CACHE_MAX_AGE'] = int(os.getenv('DASHBOARD_CACHE_MAX_AGE', '300'))
+
+    # Autocompletado: cada cuántos segundos se incorporan los lugares nuevos al índice en memoria, y
+    # si se construye en segundo plano con la primera petición del proceso (si no, con la primera búsqueda)
+    app.config['AUTOCOMPLETAR_INTERVALO'] = int(os.getenv('AUTOCOMPLETAR_INTERVALO', '30'))
+    app.config['AUTOCOMPLETAR_PRECONSTRUIR'] = os.getenv('AUTOCOMPLETAR_PRECONSTRUIR', '1') == '1'
+
+    # Instrumentación SQL: consultas y tiempo en la base por petición (Server-Timing y /admin/api/consultas).
+    # Las consultas que tardan al menos SQL_UMBRAL_LENTA_MS se registran en el log.
+    app.config['SQL_INSTRUMENTAR'] = os.getenv('SQL_INSTRUMENTAR', '1') == '1'
+    app.config['SQL_UMBRAL_LENTA_MS'] = float(os.getenv('SQL_UMBRAL_LENTA_MS', '100'))
+
+    # Cache del catálogo público de itinerarios: 'archivo' (directorio privado compartido por los
+    # workers; en /dev/shm queda en memoria compartida), 'memoria' (LRU del proceso: cada worker solo
+    # ve sus propias invalidaciones) o 'ninguno'
+    app.config['CATALOGO_CACHE'] = os.getenv('CATALOGO_CACHE', 'archivo')
+    app.config['CATALOGO_CACHE_TTL'] = int(os.getenv('CATALOGO_CACHE_TTL', '300'))
+    app.config['CATALOGO_CACHE_MAXIMO'] = int(os.getenv('CATALOGO_CACHE_MAXIMO', '512'))
+    app.config['CATALOGO_CACHE_DIR'] = os.getenv('CATALOGO_CACHE_DIR',
+                                                 os.path.join(app.instance_path, 'catalogo-cache'))
+
+    # Perfilado por muestreo: PERFILAR=1 perfila todas las peticiones; si no, solo las de
+    # administradores con el encabezado X-Perfilar: 1 (resultados en /admin/api/perfiles)
+    app.config['PERFILAR'] = os.getenv('PERFILAR', '0') == '1'
+    app.config['PERFILAR_INTERVALO_MS'] = float(os.getenv('PERFILAR_INTERVALO_MS', '5'))
     
     # Inicializar extensiones con la app
     db.init_app(app)
@@ -49,7 +80,7 @@ def create_app():
             return None
     
     # Registrar blueprints
-    from app.routes import main, itinerarios, etapas, auth, lugares, dashboard, errors 
+    from app.routes import main, itinerarios, etapas, auth, lugares, dashboard, errors, admin
     app.register_blueprint(main.bp)
     app.register_blueprint(itinerarios.bp)
     app.register_blueprint(etapas.bp)
@@ -57,6 +88,24 @@ def create_app():
     app.register_blueprint(lugares.bp)
     app.register_blueprint(dashboard.bp)
     app.register_blueprint(errors.bp)
+    app.register_blueprint(admin.bp)
+
+    # Instrumentar las consultas SQL de cada petición
+    if app.config['SQL_INSTRUMENTAR']:
+        from app.instrumentacion import instrumentar
+        instrumentar(app)
+
+    # Cache del catálogo público (se invalida al confirmar cambios de itinerarios públicos)
+    from app.cache_catalogo import configurar_cache
+    configurar_cache(app)
+
+    # Índice de autocompletado (se construye en segundo plano con la primera petición)
+    from app.autocompletar import construir_en_segundo_plano
+    construir_en_segundo_plano(app)
+
+    # Middleware de perfilado (a pedido)
+    from app.perfilado import perfilar
+    perfilar(app)
 
     # Registrar filtro de Jinja2 para fechas
     from app.utils import format_date
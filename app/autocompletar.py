@@ -0,0 +1,274 @@
+"""
+Autocompletado en memoria de lugares de interés, ciudades y provincias
+
+El índice guarda claves normalizadas (sin acentos, en minúsculas). Cada
+nombre se indexa una vez por palabra, desde esa palabra hasta el final, así
+"nahuel" encuentra "Parque Nacional Nahuel Huapi".
+
+Las claves se reparten en niveles según el orden de los resultados: primero
+las que empiezan en la primera palabra del nombre, y dentro de eso por largo
+del nombre. Cada nivel es un arreglo ordenado; una búsqueda recorre los
+niveles en orden, busca el prefijo por bisección en cada uno y se detiene al
+juntar `limite` resultados. Así el costo depende de la cantidad de niveles
+y de resultados pedidos, no de cuántos nombres empiezan con el prefijo.
+
+El índice se construye en segundo plano con la primera petición que atiende
+el proceso (construir_en_segundo_plano) y luego incorpora
+periódicamente las filas nuevas (id mayor al último visto), por ejemplo
+las que agrega cargar_lugares.py desde otro proceso. Una sincronización
+(cargar_lugares.py --sincronizar) también modifica y elimina lugares: si
+en carga_archivo aparece una sincronización nueva o terminada desde la
+última verificación, el índice se reconstruye completo.
+
+Las actualizaciones arman los arreglos nuevos de los niveles que cambian
+sin bloquear las búsquedas y los reemplazan al final; las búsquedas leen
+siempre un conjunto de niveles completo.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from flask import current_app
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app import db
+from app.utils import normalizar_texto
+
+TIPOS = ('provincia', 'ciudad', 'lugar')
+
+
+class _Contenido:
+    """Ítems del índice y claves ordenadas por nivel que apuntan a ellos"""
+
+    def __init__(self):
+        # Niveles en el orden de los resultados: tupla de (nivel, claves ordenadas, ítem de cada
+        # clave). Se reemplaza entera, así una búsqueda nunca ve un arreglo a medio actualizar
+        self.niveles = ()
+        # Datos de cada ítem en arreglos paralelos (solo crecen)
+        self.tipo = array('B')
+        self.id = array('I')
+        self.id_provincia = array('I')  # 0 = sin provincia
+        self.nombre = []
+        self.categoria = []
+        # Último id incorporado por tipo
+        self.ultimo_id = dict.fromkeys(TIPOS, 0)
+        # Nombres de provincias y ciudades, para mostrar en los resultados
+        self.nombre_provincia = {}
+        self.nombre_ciudad = {}
+        self.ciudad_de_item = {}
+
+    def agregar(self, tipo, id, nombre, normalizado=None, id_provincia=None, categoria=None, id_ciudad=None):
+        """Agrega un ítem y devuelve sus claves (una por cada palabra del nombre) como (nivel, clave, ítem)"""
+        item = len(self.nombre)
+        self.tipo.append(TIPOS.index(tipo))
+        self.id.append(id)
+        self.id_provincia.append(id_provincia or 0)
+        self.nombre.append(nombre)
+        self.categoria.append(categoria)
+        if id_ciudad:
+            self.ciudad_de_item[item] = id_ciudad
+
+        palabras = (normalizado or normalizar_texto(nombre) or '').split(' ')
+        # Nivel: primero los que empiezan con el prefijo, luego los nombres más cortos
+        return [((i > 0, len(nombre)), f"{' '.join(palabras[i:])}\x00{i:03d}\x00{item}", item)
+                for i in range(len(palabras))]
+
+    def indexar(self, nuevas):
+        """Combina las claves nuevas con las de sus niveles en arreglos nuevos (O(n + k log k)) y los publica"""
+        if not nuevas:
+            return
+        por_nivel = {}
+        for nivel, clave, item in nuevas:
+            por_nivel.setdefault(nivel, []).append((clave, item))
+        niveles = {nivel: (claves, items) for nivel, claves, items in self.niveles}
+        for nivel, claves_nivel in por_nivel.items():
+            claves_nivel.sort()
+            claves, items = niveles.get(nivel, ([], array('I')))
+            claves_nuevas = []
+            items_nuevos = array('I')
+            for clave, item in heapq.merge(zip(claves, items), claves_nivel):
+                claves_nuevas.append(clave)
+                items_nuevos.append(item)
+            niveles[nivel] = (claves_nuevas, items_nuevos)
+        self.niveles = tuple((nivel, claves, items) for nivel, (claves, items) in sorted(niveles.items()))
+
+
+class IndiceAutocompletar:
+    """Índice de prefijos sobre nombres de provincias, ciudades y lugares"""
+
+    def __init__(self, intervalo_actualizacion=30):
+        self.intervalo_actualizacion = intervalo_actualizacion
+        # Serializa las actualizaciones; las búsquedas no lo toman
+        self._lock = threading.Lock()
+        self._contenido = _Contenido()
+        self._construido = False
+        self._ultima_actualizacion = 0.0
+        self._sincronizaciones = None
+
+    def _cargar_nuevos(self, contenido):
+        """Incorpora las filas con id mayor al último visto de cada tabla"""
+        from app.models import Provincia, Ciudad, LugarInteres
+
+        ultimo_id = contenido.ultimo_id
+        provincias = (db.session.query(Provincia.idProvincia, Provincia.nombre, Provincia.nombreNormalizado)
+                      .filter(Provincia.idProvincia > ultimo_id['provincia'])
+                      .order_by(Provincia.idProvincia).all())
+        claves = []
+        for id, nombre, normalizado in provincias:
+            contenido.nombre_provincia[id] = nombre
+            claves += contenido.agregar('provincia', id, nombre, normalizado, id_provincia=id)
+            ultimo_id['provincia'] = id
+
+        ciudades = (db.session.query(Ciudad.idCiudad, Ciudad.nombre, Ciudad.nombreNormalizado, Ciudad.idProvincia)
+                    .filter(Ciudad.idCiudad > ultimo_id['ciudad'])
+                    .order_by(Ciudad.idCiudad).all())
+        for id, nombre, normalizado, id_provincia in ciudades:
+            contenido.nombre_ciudad[id] = nombre
+            claves += contenido.agregar('ciudad', id, nombre, normalizado, id_provincia=id_provincia)
+            ultimo_id['ciudad'] = id
+
+        lugares = (db.session.query(LugarInteres.idLugarInteres, LugarInteres.nombre,
+                                    LugarInteres.nombreNormalizado, LugarInteres.idProvincia,
+                                    LugarInteres.categoria, LugarInteres.idCiudad)
+                   .filter(LugarInteres.idLugarInteres > ultimo_id['lugar'])
+                   .order_by(LugarInteres.idLugarInteres).all())
+        for id, nombre, normalizado, id_provincia, categoria, id_ciudad in lugares:
+            claves += contenido.agregar('lugar', id, nombre, normalizado, id_provincia=id_provincia,
+                                        categoria=categoria, id_ciudad=id_ciudad)
+            ultimo_id['lugar'] = id
+
+        contenido.indexar(claves)
+        return len(provincias) + len(ciudades) + len(lugares)
+
+    def _estado_sincronizaciones(self):
+        """Última sincronización registrada en carga_archivo (id y fin), o None si no hay registro"""
+        from app.models import CargaArchivo
+
+        try:
+            return tuple(db.session.query(db.func.max(CargaArchivo.idCarga), db.func.max(CargaArchivo.fin))
+                         .filter(CargaArchivo.modo == 'sincronizacion').one())
+        except (OperationalError, ProgrammingError):
+            # Base sin la tabla de registro de cargas (migración 6 pendiente)
+            db.session.rollback()
+            return None
+
+    def _reconstruir(self):
+        contenido = _Contenido()
+        total = self._cargar_nuevos(contenido)
+        self._contenido = contenido
+        self._construido = True
+        self._ultima_actualizacion = time.monotonic()
+        return total
+
+    def reconstruir(self):
+        """Vuelve a construir el índice completo desde la base de datos"""
+        with self._lock:
+            self._sincronizaciones = self._estado_sincronizaciones()
+            return self._reconstruir()
+
+    def actualizar(self, forzar=False):
+        """Construye el índice si hace falta, o lo reconstruye tras una sincronización, o incorpora las filas nuevas"""
+        if self._construido and not forzar and \
+                time.monotonic() - self._ultima_actualizacion < self.intervalo_actualizacion:
+            return 0
+        # Si otro hilo ya está actualizando, se busca sobre el índice actual sin esperar
+        if not self._lock.acquire(blocking=not self._construido):
+            return 0
+        try:
+            sincronizaciones = self._estado_sincronizaciones()
+            if not self._construido or sincronizaciones != self._sincronizaciones:
+                self._sincronizaciones = sincronizaciones
+                return self._reconstruir()
+            nuevos = self._cargar_nuevos(self._contenido)
+            self._ultima_actualizacion = time.monotonic()
+        finally:
+            self._lock.release()
+        return nuevos
+
+    def buscar(self, texto, limite=10, provincia_id=None, categoria=None, tipos=None):
+        """Devuelve hasta `limite` ítems cuyo nombre tiene una palabra que empieza con el texto.
+
+        Orden: coincide al inicio del nombre, nombre más corto, alfabético.
+        """
+        prefijo = normalizar_texto(texto)
+        if not prefijo or limite < 1:
+            return []
+        fin_prefijo = prefijo + '\uffff'
+        id_tipos = {TIPOS.index(tipo) for tipo in tipos if tipo in TIPOS} if tipos else None
+
+        contenido = self._contenido
+        mejores = []
+        vistos = set()
+        # Los niveles ya están en el orden de los resultados, y dentro de cada uno las claves
+        # en orden alfabético: el primer ítem que pasa los filtros es el mejor que queda
+        for _, claves, items_de_clave in contenido.niveles:
+            inicio = bisect_left(claves, prefijo)
+            for posicion in range(inicio, bisect_left(claves, fin_prefijo, lo=inicio)):
+                item = items_de_clave[posicion]
+                if item in vistos:
+                    continue
+                vistos.add(item)
+                if id_tipos is not None and contenido.tipo[item] not in id_tipos:
+                    continue
+                if provincia_id and contenido.id_provincia[item] != provincia_id:
+                    continue
+                if categoria and contenido.categoria[item] != categoria:
+                    continue
+                mejores.append(item)
+                if len(mejores) == limite:
+                    return [self._resultado(contenido, item) for item in mejores]
+        return [self._resultado(contenido, item) for item in mejores]
+
+    def _resultado(self, contenido, item):
+        tipo = TIPOS[contenido.tipo[item]]
+        id_provincia = contenido.id_provincia[item]
+        id_ciudad = contenido.ciudad_de_item.get(item)
+        return {
+            'tipo': tipo,
+            'id': contenido.id[item],
+            'nombre': contenido.nombre[item],
+            'categoria': contenido.categoria[item],
+            'provincia': contenido.nombre_provincia.get(id_provincia) if tipo != 'provincia' else None,
+            'ciudad': contenido.nombre_ciudad.get(id_ciudad) if id_ciudad else None,
+        }
+
+    def __len__(self):
+        return len(self._contenido.nombre)
+
+
+def obtener_indice():
+    """Devuelve el índice de autocompletado de la aplicación actual, actualizado"""
+    indice = current_app.extensions.get('autocompletar')
+    if indice is None:
+        indice = IndiceAutocompletar(current_app.config.get('AUTOCOMPLETAR_INTERVALO', 30))
+        current_app.extensions['autocompletar'] = indice
+    indice.actualizar()
+    return indice
+
+
+def construir_en_segundo_plano(app):
+    """Crea el índice de la app y, con AUTOCOMPLETAR_PRECONSTRUIR, lo construye en un hilo
+    con la primera petición que atiende el proceso.
+
+    No se construye en create_app(): los comandos y scripts que crean la app
+    (flask migrar, init_db.py, cargar_lugares.py) no lo usan.
+    """
+    indice = IndiceAutocompletar(app.config.get('AUTOCOMPLETAR_INTERVALO', 30))
+    app.extensions['autocompletar'] = indice
+    if not app.config.get('AUTOCOMPLETAR_PRECONSTRUIR'):
+        return
+    iniciado = threading.Event()
+
+    def construir():
+        with app.app_context():
+            try:
+                indice.actualizar()
+            except Exception:
+                # La primera búsqueda vuelve a intentarlo
+                app.logger.exception('No se pudo construir el índice de autocompletado')
+
+    @app.before_request
+    def _iniciar_construccion():
+        if not iniciado.is_set():
+            iniciado.set()
+            threading.Thread(target=construir, name='autocompletar', daemon=True).start()
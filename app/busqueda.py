@@ -0,0 +1,169 @@
+"""
+Índice de texto completo (SQLite FTS5) para la búsqueda de lugares de interés
+
+La tabla virtual lugar_interes_fts replica nombre, categoría, provincia y
+ciudad de cada LugarInteres (rowid = idLugarInteres) y se mantiene
+sincronizada con triggers. El tokenizador quita acentos y pasa a
+minúsculas, así que "neuquen" encuentra "Neuquén".
+"""
+import re
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.utils import normalizar_texto
+
+TABLA_FTS = 'lugar_interes_fts'
+
+_SELECT_LUGAR = """
+    SELECT {p}.idLugarInteres, {p}.nombre, {p}.categoria,
+           (SELECT nombre FROM provincia WHERE idProvincia = {p}.idProvincia),
+           (SELECT nombre FROM ciudad WHERE idCiudad = {p}.idCiudad)
+"""
+
+DDL_FTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        nombre, categoria, provincia, ciudad,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS lugar_interes_fts_ai AFTER INSERT ON lugar_interes BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, nombre, categoria, provincia, ciudad)
+        {_SELECT_LUGAR.format(p='new')};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS lugar_interes_fts_ad AFTER DELETE ON lugar_interes BEGIN
+        DELETE FROM {TABLA_FTS} WHERE rowid = old.idLugarInteres;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS lugar_interes_fts_au AFTER UPDATE ON lugar_interes BEGIN
+        DELETE FROM {TABLA_FTS} WHERE rowid = old.idLugarInteres;
+        INSERT INTO {TABLA_FTS}(rowid, nombre, categoria, provincia, ciudad)
+        {_SELECT_LUGAR.format(p='new')};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS provincia_fts_au AFTER UPDATE OF nombre ON provincia BEGIN
+        UPDATE {TABLA_FTS} SET provincia = new.nombre
+        WHERE rowid IN (SELECT idLugarInteres FROM lugar_interes WHERE idProvincia = new.idProvincia);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS ciudad_fts_au AFTER UPDATE OF nombre ON ciudad BEGIN
+        UPDATE {TABLA_FTS} SET ciudad = new.nombre
+        WHERE rowid IN (SELECT idLugarInteres FROM lugar_interes WHERE idCiudad = new.idCiudad);
+    END""",
+]
+
+# Resultado de la verificación de la tabla FTS, por URL de base de datos
+_fts_disponible = {}
+
+
+def crear_indice_fts(connection):
+    """Crea la tabla FTS5 y sus triggers (solo en SQLite)"""
+    if connection.dialect.name != 'sqlite':
+        return
+    for sentencia in DDL_FTS:
+        connection.exec_driver_sql(sentencia)
+
+
+def eliminar_indice_fts(connection):
+    """Elimina la tabla FTS5 (los triggers se eliminan con sus tablas)"""
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+def llenar_indice_fts(connection):
+    """Vuelve a llenar el índice FTS5 desde lugar_interes"""
+    connection.exec_driver_sql(f'DELETE FROM {TABLA_FTS}')
+    connection.exec_driver_sql(
+        f'INSERT INTO {TABLA_FTS}(rowid, nombre, categoria, provincia, ciudad) '
+        + _SELECT_LUGAR.format(p='lugar_interes') + ' FROM lugar_interes'
+    )
+
+
+def reconstruir_indice_fts():
+    """Crea el índice si no existe y lo vuelve a llenar desde lugar_interes"""
+    with db.engine.begin() as connection:
+        crear_indice_fts(connection)
+        llenar_indice_fts(connection)
+        total = connection.exec_driver_sql(f'SELECT count(*) FROM {TABLA_FTS}').scalar()
+    _fts_disponible.pop(str(db.engine.url), None)
+    return total
+
+
+def fts_disponible():
+    """Indica si la base de datos actual tiene el índice FTS5"""
+    clave = str(db.engine.url)
+    if clave not in _fts_disponible:
+        disponible = False
+        if db.engine.dialect.name == 'sqlite':
+            try:
+                with db.engine.connect() as connection:
+                    disponible = connection.exec_driver_sql(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLA_FTS,)
+                    ).first() is not None
+            except OperationalError:
+                disponible = False
+        _fts_disponible[clave] = disponible
+    return _fts_disponible[clave]
+
+
+# Columnas del índice en las que se busca el texto: "neuquen" encuentra los lugares de Neuquén
+COLUMNAS_BUSQUEDA = ('nombre', 'categoria', 'provincia', 'ciudad')
+
+
+def expresion_prefijos(texto, columnas=COLUMNAS_BUSQUEDA):
+    """Convierte el texto del usuario en una consulta FTS5 de prefijos.
+
+    Cada palabra se busca como prefijo y todas deben aparecer en alguna de
+    las columnas indicadas ("parque neuquen" encuentra los parques de
+    Neuquén). Devuelve None si el texto no tiene palabras buscables.
+    """
+    palabras = re.findall(r'\w+', texto, flags=re.UNICODE)
+    if not palabras:
+        return None
+    terminos = ' AND '.join(f'"{p}"*' for p in palabras)
+    return '{%s} : (%s)' % (' '.join(columnas), terminos)
+
+
+def _empieza_con(columna, prefijo):
+    """Condición de prefijo como rango (col >= 'abc' AND col < 'abd'), que usa el índice de la columna"""
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return db.and_(columna >= prefijo, columna < siguiente)
+
+
+def _alguna_palabra_empieza_con(columna, prefijo):
+    """Condición de prefijo sobre cualquier palabra: la primera por rango y las demás con LIKE '% abc%'"""
+    return db.or_(_empieza_con(columna, prefijo), columna.contains(' ' + prefijo, autoescape=True))
+
+
+def filtrar_por_nombre(query, texto):
+    """Aplica a una consulta de LugarInteres el filtro por texto (nombre, categoría, provincia o ciudad).
+
+    Usa el índice FTS5 (prefijos de cada palabra) si está disponible y, si
+    no, busca el texto como prefijo de alguna palabra de nombreNormalizado
+    del lugar, de su ciudad o de su provincia ("iguazu" encuentra "Parque
+    Nacional Iguazú"). En ambos casos se ignoran acentos y mayúsculas.
+
+    Devuelve (consulta, relevancia): relevancia es la columna rank de FTS5
+    (menor es mejor) para ordenar los resultados, o None sin FTS5.
+    """
+    from app.models import LugarInteres, Ciudad, Provincia
+
+    normalizado = normalizar_texto(texto)
+    if not normalizado:
+        return query, None
+    expresion = expresion_prefijos(normalizado)
+    if expresion is None or not fts_disponible():
+        # Unión de ids en lugar de OR: las ramas de ciudad y provincia usan el índice de lugares
+        # por ciudad/provincia y solo la del nombre del lugar recorre la tabla
+        coincidentes = db.union(
+            db.select(LugarInteres.idLugarInteres)
+            .where(_alguna_palabra_empieza_con(LugarInteres.nombreNormalizado, normalizado)),
+            db.select(LugarInteres.idLugarInteres).where(LugarInteres.idCiudad.in_(
+                db.select(Ciudad.idCiudad)
+                .where(_alguna_palabra_empieza_con(Ciudad.nombreNormalizado, normalizado)))),
+            db.select(LugarInteres.idLugarInteres).where(LugarInteres.idProvincia.in_(
+                db.select(Provincia.idProvincia)
+                .where(_alguna_palabra_empieza_con(Provincia.nombreNormalizado, normalizado)))),
+        )
+        return query.filter(LugarInteres.idLugarInteres.in_(coincidentes)), None
+
+    fts = db.table(TABLA_FTS, db.column('rowid'), db.column('rank'))
+    query = (query
+             .join(fts, fts.c.rowid == LugarInteres.idLugarInteres)
+             .filter(db.text(f'{TABLA_FTS} MATCH :expresion_fts').bindparams(expresion_fts=expresion)))
+    return query, fts.c.rank
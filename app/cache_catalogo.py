@@ -0,0 +1,345 @@
+"""
+Cache del catálogo público de itinerarios
+
+Guarda fragmentos renderizados y resultados de consultas de los listados
+públicos (los que ven igual todos los visitantes anónimos). El
+almacenamiento es intercambiable:
+
+- 'archivo': un archivo JSON por entrada en un directorio privado del
+  usuario (por defecto instance/catalogo-cache), compartido por los
+  workers del mismo equipo (en /dev/shm queda en memoria compartida). Es
+  el almacén por defecto: una invalidación llega a todos los workers.
+- 'memoria': LRU con vencimiento en el proceso. Cada worker tiene el suyo
+  y solo ve las invalidaciones hechas en ese mismo proceso: los demás
+  siguen mostrando sus entradas hasta que vencen (CATALOGO_CACHE_TTL).
+  Sirve con un solo proceso o si esa demora es aceptable.
+- 'ninguno': sin cache.
+
+Cada entrada lleva etiquetas: 'catalogo' (qué itinerarios entran en el
+listado y en qué orden) y 'itinerario:<id>' por cada itinerario que
+muestra. Invalidar una etiqueta le asigna un token nuevo; una entrada
+guardada con otro token ya no se devuelve. Las etiquetas se invalidan al
+confirmar una transacción que crea, modifica o elimina un itinerario
+público o alguna de sus etapas, o que cambia el nombre de un usuario
+(eventos de la sesión de SQLAlchemy). Las actualizaciones y eliminaciones
+masivas por la sesión (query.update()/delete(), db.session.execute(update))
+sobre itinerarios, etapas o usuarios invalidan todo el catálogo, salvo que
+indiquen sus etiquetas en la opción de ejecución 'etiquetas_catalogo'. Lo
+que se escribe por fuera de la sesión (una conexión directa) no invalida
+nada: vence por TTL.
+"""
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+ETIQUETA_CATALOGO = 'catalogo'
+
+
+def etiqueta_itinerario(id_itinerario):
+    return f'itinerario:{id_itinerario}'
+
+
+class AlmacenMemoria:
+    """LRU en memoria con vencimiento. Es seguro compartirlo entre hilos."""
+
+    def __init__(self, maximo=512):
+        self.maximo = maximo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence is not None and vence < time.time():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl=None):
+        with self._lock:
+            self._entradas[clave] = (time.time() + ttl if ttl else None, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def _asegurar_directorio_privado(directorio):
+    """Crea el directorio solo para el usuario actual y verifica que nadie más pueda escribirlo"""
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    datos = os.lstat(directorio)
+    if not stat.S_ISDIR(datos.st_mode):
+        raise PermissionError(f'El cache del catálogo no es un directorio: {directorio}')
+    if hasattr(os, 'getuid'):
+        if datos.st_uid != os.getuid():
+            raise PermissionError(f'El directorio del cache del catálogo pertenece a otro usuario: {directorio}')
+        if datos.st_mode & 0o077:
+            os.chmod(directorio, 0o700)
+
+
+class AlmacenArchivo:
+    """Un archivo JSON por entrada en un directorio privado, compartido entre procesos del mismo usuario"""
+
+    # Cada cuántas escrituras del proceso se borran las entradas vencidas
+    PURGAR_CADA = 256
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._escrituras = 0
+        _asegurar_directorio_privado(directorio)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, hashlib.sha1(clave.encode('utf-8')).hexdigest())
+
+    def obtener(self, clave):
+        try:
+            with open(self._ruta(clave), encoding='utf-8') as archivo:
+                vence, guardada, valor = json.load(archivo)
+        except (OSError, ValueError):
+            return None
+        # El nombre es un hash: se verifica la clave por si hubiera una colisión
+        if guardada != clave or (vence is not None and vence < time.time()):
+            return None
+        return valor
+
+    def guardar(self, clave, valor, ttl=None):
+        # Escribir a un temporal y reemplazar, para que otro proceso nunca lea un archivo a medias
+        ruta = self._ruta(clave)
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, prefix='.tmp-')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+            json.dump([time.time() + ttl if ttl else None, clave, valor], archivo)
+        os.replace(temporal, ruta)
+        self._escrituras += 1
+        if self._escrituras % self.PURGAR_CADA == 0:
+            self.purgar_vencidas()
+
+    def purgar_vencidas(self):
+        """Borra los archivos de las entradas vencidas (las páginas que nadie volvió a pedir)"""
+        ahora = time.time()
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    vence = json.load(archivo)[0]
+                if vence is not None and vence < ahora:
+                    os.remove(ruta)
+            except (OSError, ValueError, IndexError, KeyError):
+                pass
+
+    def limpiar(self):
+        for nombre in os.listdir(self.directorio):
+            try:
+                os.remove(os.path.join(self.directorio, nombre))
+            except OSError:
+                pass
+
+    def __len__(self):
+        return sum(1 for nombre in os.listdir(self.directorio) if not nombre.startswith('.tmp-'))
+
+
+class CacheCatalogo:
+    """Entradas con etiquetas sobre un almacén intercambiable"""
+
+    def __init__(self):
+        self.almacen = None
+        self.ttl = None
+        self.hits = 0
+        self.misses = 0
+        self._lock_contadores = threading.Lock()
+
+    def configurar(self, almacen, ttl=None):
+        """Usa el almacén indicado (None desactiva el cache)"""
+        self.almacen = almacen
+        self.ttl = ttl
+        with self._lock_contadores:
+            self.hits = self.misses = 0
+
+    def _contar(self, acierto):
+        with self._lock_contadores:
+            if acierto:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def activo(self):
+        return self.almacen is not None
+
+    def _token(self, etiqueta, crear=False):
+        clave = f'etiqueta:{etiqueta}'
+        token = self.almacen.obtener(clave)
+        if token is None and crear:
+            token = uuid.uuid4().hex
+            self.almacen.guardar(clave, token)
+        return token
+
+    def obtener(self, clave):
+        """Devuelve el valor guardado, o None si no está, venció o se invalidó alguna de sus etiquetas"""
+        if not self.activo:
+            return None
+        entrada = self.almacen.obtener(f'entrada:{clave}')
+        if entrada is not None:
+            tokens, valor = entrada
+            if all(self._token(etiqueta) == token for etiqueta, token in tokens.items()):
+                self._contar(True)
+                return valor
+        self._contar(False)
+        return None
+
+    def obtener_o_calcular(self, clave, calcular):
+        """Devuelve el valor de la clave; si no está, lo calcula con calcular() y lo guarda.
+
+        calcular() devuelve (valor, etiquetas). El token del catálogo se toma
+        antes de calcular, así una invalidación concurrente deja la entrada
+        vieja desde el principio; el TTL acota cualquier otra carrera.
+        """
+        valor = self.obtener(clave)
+        if valor is not None:
+            return valor
+        if not self.activo:
+            return calcular()[0]
+        token_catalogo = self._token(ETIQUETA_CATALOGO, crear=True)
+        valor, etiquetas = calcular()
+        tokens = {etiqueta: self._token(etiqueta, crear=True) for etiqueta in etiquetas}
+        tokens[ETIQUETA_CATALOGO] = token_catalogo
+        self.almacen.guardar(f'entrada:{clave}', (tokens, valor), self.ttl)
+        return valor
+
+    def invalidar(self, *etiquetas):
+        """Invalida todas las entradas que llevan alguna de las etiquetas"""
+        if not self.activo:
+            return
+        for etiqueta in etiquetas:
+            self.almacen.guardar(f'etiqueta:{etiqueta}', uuid.uuid4().hex)
+
+    def limpiar(self):
+        """Descarta todas las entradas (por ejemplo, al reemplazar la base de datos)"""
+        if self.activo:
+            self.almacen.limpiar()
+
+    def estadisticas(self):
+        if not self.activo:
+            return {'almacen': None}
+        with self._lock_contadores:
+            hits, misses = self.hits, self.misses
+        return {
+            'almacen': type(self.almacen).__name__,
+            'hits': hits,
+            'misses': misses,
+            'entradas': len(self.almacen),
+        }
+
+
+# Instancia compartida por toda la aplicación
+cache_catalogo = CacheCatalogo()
+
+
+def configurar_cache(app):
+    """Configura el almacén según CATALOGO_CACHE ('memoria', 'archivo' o 'ninguno')"""
+    tipo = app.config['CATALOGO_CACHE']
+    ttl = app.config['CATALOGO_CACHE_TTL'] or None
+    if tipo == 'memoria':
+        cache_catalogo.configurar(AlmacenMemoria(app.config['CATALOGO_CACHE_MAXIMO']), ttl)
+    elif tipo == 'archivo':
+        cache_catalogo.configurar(AlmacenArchivo(app.config['CATALOGO_CACHE_DIR']), ttl)
+    elif tipo == 'ninguno':
+        cache_catalogo.configurar(None)
+    else:
+        raise ValueError(f"CATALOGO_CACHE desconocido: {tipo!r} (use 'memoria', 'archivo' o 'ninguno')")
+
+
+def _es_publico(valor):
+    return valor is not None and int(valor) == 0
+
+
+def _etiquetas_afectadas(session):
+    """Etiquetas que invalidan los cambios pendientes de la sesión"""
+    from app.models import Itinerario, Etapa, Usuario
+
+    etiquetas = set()
+    ids_etapas = set()
+    for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(objeto, Usuario):
+            # El nombre del autor aparece en el listado; renombrar a alguien es raro
+            estado = inspect(objeto)
+            if estado.attrs.nombre.history.has_changes() or estado.attrs.apellido.history.has_changes():
+                etiquetas.add(ETIQUETA_CATALOGO)
+            continue
+        if isinstance(objeto, Itinerario):
+            estado = inspect(objeto)
+            privado = estado.attrs.esPrivado.history
+            antes = privado.deleted[0] if privado.deleted else (privado.unchanged or privado.added or [None])[0]
+            ahora = objeto.esPrivado
+            if objeto in session.new:
+                if _es_publico(ahora):
+                    etiquetas.add(ETIQUETA_CATALOGO)
+            elif objeto in session.deleted:
+                if _es_publico(antes):
+                    etiquetas.add(ETIQUETA_CATALOGO)
+            elif _es_publico(antes) or _es_publico(ahora):
+                # Cambia qué itinerarios entran en el listado o su orden
+                if privado.has_changes() or estado.attrs.fechaInicio.history.has_changes():
+                    etiquetas.add(ETIQUETA_CATALOGO)
+                elif session.is_modified(objeto, include_collections=False):
+                    etiquetas.add(etiqueta_itinerario(objeto.idItinerario))
+        elif isinstance(objeto, Etapa) and objeto.idItinerario is not None:
+            ids_etapas.add(objeto.idItinerario)
+
+    if ids_etapas:
+        # Solo las etapas de itinerarios públicos (sin autoflush: se llama durante el flush)
+        with session.no_autoflush:
+            for id_itinerario in ids_etapas:
+                itinerario = session.get(Itinerario, id_itinerario)
+                if itinerario is None or _es_publico(itinerario.esPrivado):
+                    etiquetas.add(etiqueta_itinerario(id_itinerario))
+    return etiquetas
+
+
+@event.listens_for(Session, 'before_flush')
+def _registrar_cambios(session, flush_context, instances):
+    if cache_catalogo.activo:
+        session.info.setdefault('etiquetas_catalogo', set()).update(_etiquetas_afectadas(session))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _registrar_operaciones_masivas(estado):
+    """Las actualizaciones y eliminaciones masivas no pasan por before_flush"""
+    if not cache_catalogo.activo or not (estado.is_update or estado.is_delete):
+        return
+    from app.models import Itinerario, Etapa, Usuario
+
+    mapper = estado.bind_mapper
+    if mapper is None or not issubclass(mapper.class_, (Itinerario, Etapa, Usuario)):
+        return
+    etiquetas = estado.execution_options.get('etiquetas_catalogo') or (ETIQUETA_CATALOGO,)
+    estado.session.info.setdefault('etiquetas_catalogo', set()).update(etiquetas)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_al_confirmar(session):
+    etiquetas = session.info.pop('etiquetas_catalogo', None)
+    if etiquetas:
+        cache_catalogo.invalidar(*etiquetas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_cambios(session):
+    session.info.pop('etiquetas_catalogo', None)
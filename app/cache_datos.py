@@ -0,0 +1,134 @@
+"""
+Cache en memoria para los datasets CSV usados por el dashboard
+
+pandas se importa recién en la primera lectura de un dataset, así los
+procesos que no sirven el dashboard (CLI, otros workers) no lo cargan.
+"""
+import hashlib
+import json
+import os
+import threading
+from app import columnar
+
+
+class CacheDatasets:
+    """Cache de DataFrames indexado por ruta de archivo.
+
+    Cada entrada guarda la firma del archivo (mtime y tamaño, más la de su
+    versión columnar) al momento de leerlo; si el archivo cambia en disco se
+    vuelve a leer en el siguiente acceso. Es seguro compartirlo entre hilos.
+    """
+
+    def __init__(self):
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _firma(path):
+        """Devuelve la firma del dataset: (mtime_ns, tamaño) del CSV y de su versión columnar"""
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size, columnar.firma(path)
+
+    def obtener(self, path, columnas=None):
+        """Devuelve el DataFrame del archivo, leyéndolo solo si cambió.
+
+        Si se indican columnas, solo se leen esas. Se usa la versión columnar
+        (memory-map) cuando está al día y, si no, el CSV.
+        El DataFrame devuelto es compartido: no debe modificarse in-place.
+        """
+        path = os.path.abspath(path)
+        columnas = tuple(columnas) if columnas else None
+        clave = (path, columnas)
+        firma = self._firma(path)
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] == firma:
+                self.hits += 1
+                return entrada[1]
+            self.misses += 1
+
+        # La lectura se hace fuera del lock para no bloquear otros datasets
+        df = columnar.leer(path, columnas)
+        if df is None:
+            import pandas as pd
+            df = pd.read_csv(path, usecols=list(columnas) if columnas else None)
+
+        with self._lock:
+            self._entradas[clave] = (firma, df)
+        return df
+
+    def invalidar(self, path=None):
+        """Elimina las entradas de un archivo (o todas si no se indica ruta)"""
+        with self._lock:
+            if path is None:
+                self._entradas.clear()
+            else:
+                path = os.path.abspath(path)
+                for clave in [c for c in self._entradas if c[0] == path]:
+                    del self._entradas[clave]
+
+    def estadisticas(self):
+        """Devuelve los contadores de aciertos y fallos del cache"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entradas': len(self._entradas),
+            }
+
+
+# Instancia compartida por toda la aplicación
+cache_datos = CacheDatasets()
+
+
+class RespuestasPrecalculadas:
+    """Respuestas JSON por año precalculadas a partir de un dataset.
+
+    Para cada año presente en el archivo se construye una única vez el
+    cuerpo JSON ya serializado y su ETag; se recalculan todas cuando cambia
+    la firma del archivo fuente.
+    """
+
+    def __init__(self, path, construir, columnas=None):
+        # construir(df, año) -> dict con el payload de ese año
+        self.path = os.path.abspath(path)
+        self.construir = construir
+        self.columnas = columnas
+        self._firma = None
+        self._respuestas = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def serializar(payload):
+        """Serializa un payload igual que jsonify y calcula su ETag fuerte"""
+        cuerpo = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return cuerpo, hashlib.sha1(cuerpo).hexdigest()
+
+    def precalcular(self):
+        """Construye las respuestas de todos los años si el archivo cambió"""
+        firma = CacheDatasets._firma(self.path)
+        with self._lock:
+            if firma == self._firma:
+                return
+            df = cache_datos.obtener(self.path, self.columnas)
+            respuestas = {}
+            for año in df['año'].unique().tolist():
+                año = str(año)
+                respuestas[año] = self.serializar(self.construir(df, año))
+            self._respuestas = respuestas
+            self._firma = firma
+
+    def obtener(self, año):
+        """Devuelve (cuerpo, etag) para el año indicado.
+
+        Los años que no están en el archivo se construyen al vuelo y no se
+        guardan, para no acumular entradas por parámetros arbitrarios.
+        """
+        self.precalcular()
+        respuesta = self._respuestas.get(año)
+        if respuesta is None:
+            respuesta = self.serializar(self.construir(cache_datos.obtener(self.path, self.columnas), año))
+        return respuesta
@@ -0,0 +1,121 @@
+"""
+Almacenamiento columnar (un .npy por columna) para los datasets CSV
+
+Cada CSV de data/ puede convertirse a data/columnar/<nombre>/, con un
+archivo .npy por columna y un meta.json con la firma del CSV de origen.
+Las columnas se leen con memory-map, de modo que solo se cargan las que
+se piden. Si el CSV cambió después de la conversión, la versión columnar
+se ignora y se vuelve a leer el CSV.
+
+Las columnas de texto se guardan como unicode de ancho fijo; sus valores
+faltantes se marcan en un .npy de máscara aparte y se vuelven a leer como
+NaN, igual que al leer el CSV.
+
+numpy y pandas se importan dentro de las funciones que los usan para no
+cargarlos en procesos que nunca leen datasets.
+"""
+import json
+import os
+
+META = 'meta.json'
+# Versión del formato: las conversiones de otra versión se ignoran
+VERSION = 2
+
+
+def _firma_csv(csv_path):
+    """Devuelve [mtime_ns, tamaño] del CSV"""
+    st = os.stat(csv_path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def ruta_columnar(csv_path):
+    """Devuelve el directorio columnar correspondiente a un CSV"""
+    directorio, archivo = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directorio, 'columnar', os.path.splitext(archivo)[0])
+
+
+def _leer_meta(csv_path):
+    """Devuelve el meta.json vigente para el CSV, o None si falta o está desactualizado"""
+    meta_path = os.path.join(ruta_columnar(csv_path), META)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != VERSION or meta.get('firma_csv') != _firma_csv(csv_path):
+        return None
+    return meta
+
+
+def firma(csv_path):
+    """Firma de la versión columnar (mtime del meta.json), o None si no hay"""
+    try:
+        return os.stat(os.path.join(ruta_columnar(csv_path), META)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def convertir_csv(csv_path):
+    """Convierte un CSV a formato columnar y devuelve el directorio generado"""
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    destino = ruta_columnar(csv_path)
+    os.makedirs(destino, exist_ok=True)
+
+    columnas = {}
+    nulos = {}
+    for i, columna in enumerate(df.columns):
+        serie = df[columna]
+        archivo = f'c{i}.npy'
+        if pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            # Texto como unicode de ancho fijo para poder usar memory-map; los faltantes van en una máscara
+            faltantes = serie.isna().to_numpy()
+            valores = serie.astype(object).where(~faltantes, '').astype(str).to_numpy(dtype=str)
+            if faltantes.any():
+                nulos[columna] = f'c{i}_nulos.npy'
+                np.save(os.path.join(destino, nulos[columna]), faltantes, allow_pickle=False)
+        else:
+            valores = serie.to_numpy()
+        np.save(os.path.join(destino, archivo), valores, allow_pickle=False)
+        columnas[columna] = archivo
+
+    # El meta se escribe al final: si la conversión falla queda la versión anterior o ninguna
+    meta = {'version': VERSION, 'firma_csv': _firma_csv(csv_path), 'filas': len(df),
+            'columnas': columnas, 'nulos': nulos}
+    meta_tmp = os.path.join(destino, META + '.tmp')
+    with open(meta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(meta_tmp, os.path.join(destino, META))
+    return destino
+
+
+def leer(csv_path, columnas=None):
+    """Lee las columnas pedidas desde la versión columnar.
+
+    Devuelve None si no existe una conversión vigente para el CSV o si
+    falta alguna de las columnas pedidas.
+    """
+    meta = _leer_meta(csv_path)
+    if meta is None:
+        return None
+    disponibles = meta['columnas']
+    columnas = list(columnas) if columnas else list(disponibles)
+    if any(c not in disponibles for c in columnas):
+        return None
+
+    import numpy as np
+    import pandas as pd
+
+    destino = ruta_columnar(csv_path)
+    datos = {}
+    for c in columnas:
+        valores = np.load(os.path.join(destino, disponibles[c]), mmap_mode='r', allow_pickle=False)
+        if c in meta['nulos']:
+            # Texto con faltantes: NaN como en el CSV (esta columna se copia a memoria)
+            faltantes = np.load(os.path.join(destino, meta['nulos'][c]), allow_pickle=False)
+            valores = valores.astype(object)
+            valores[faltantes] = np.nan
+        datos[c] = valores
+    return pd.DataFrame(datos, columns=columnas, copy=False)
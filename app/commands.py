@@ -7,6 +7,8 @@ from app.models import Itinerario, Etapa
 @with_appcontext
 def backfill_orden_command():
     """Asigna valores de orden a etapas existentes que no lo tienen."""
+    from app.orden_etapas import orden_entre
+
     itinerarios = Itinerario.query.all()
     total_actualizadas = 0
     
@@ -28,7 +30,7 @@ def backfill_orden_command():
         print(f"  -> Actualizando {len(etapas_a_ordenar)} etapas para el itinerario '{itinerario.titulo}' (ID: {itinerario.idItinerario})...")
         
         for etapa in etapas_a_ordenar:
-            max_orden += 1
+            max_orden = orden_entre(max_orden, None)
             etapa.orden = max_orden
             total_actualizadas += 1
             
@@ -42,7 +44,154 @@ def backfill_orden_command():
     else:
         print("\nNo se encontraron etapas para actualizar.")
 
+@click.command('convertir-datasets')
+@with_appcontext
+def convertir_datasets_command():
+    """Convierte los CSV de data/ a formato columnar (.npy por columna)."""
+    import glob
+    import os
+    from app import columnar
+    from app.routes.dashboard import get_data_dir
+
+    archivos = sorted(glob.glob(os.path.join(get_data_dir(), '*.csv')))
+    if not archivos:
+        print("No se encontraron archivos CSV para convertir.")
+        return
+
+    for csv_path in archivos:
+        try:
+            destino = columnar.convertir_csv(csv_path)
+            print(f"  ✓ {os.path.basename(csv_path)} -> {os.path.relpath(destino, get_data_dir())}")
+        except Exception as e:
+            print(f"  ✗ Error al convertir {os.path.basename(csv_path)}: {e}")
+
+@click.command('reindexar-lugares')
+@with_appcontext
+def reindexar_lugares_command():
+    """Crea (si falta) y reconstruye el índice de búsqueda FTS5 de lugares."""
+    from app.busqueda import reconstruir_indice_fts
+
+    if db.engine.dialect.name != 'sqlite':
+        print("El índice FTS5 solo está disponible en SQLite.")
+        return
+
+    total = reconstruir_indice_fts()
+    print(f"Índice de búsqueda reconstruido: {total} lugares indexados.")
+
+@click.command('normalizar-nombres')
+@with_appcontext
+def normalizar_nombres_command():
+    """Agrega (si falta) y recalcula nombreNormalizado de provincias, ciudades y lugares."""
+    from app.migraciones import completar_nombres_normalizados
+
+    try:
+        with db.engine.begin() as connection:
+            completar_nombres_normalizados(connection)
+        print("Nombres normalizados de provincias, ciudades y lugares actualizados.")
+    except Exception as e:
+        print(f"\nError al guardar los cambios: {e}")
+
+@click.command('migrar')
+@with_appcontext
+def migrar_command():
+    """Aplica las migraciones de esquema pendientes."""
+    from app.migraciones import aplicar_migraciones
+
+    nuevas = aplicar_migraciones()
+    if not nuevas:
+        print("El esquema ya está actualizado.")
+        return
+    for version, descripcion in nuevas:
+        print(f"  ✓ Migración {version}: {descripcion}")
+
+def _consultas_por_ruta():
+    """Consultas representativas de cada ruta, para revisar su plan de ejecución"""
+    from app.models import Itinerario, Etapa, Ciudad, LugarInteres, Provincia
+    from app.models.itinerario import FECHA_ORDEN
+
+    return [
+        ('itinerarios.listar', Itinerario.query.filter(
+            Itinerario.esPrivado == 0, Itinerario.idUsuario != 1)
+            .order_by(FECHA_ORDEN.desc(), Itinerario.idItinerario.desc()).limit(51)),
+        ('itinerarios.listar (cursor)', Itinerario.query.filter(
+            Itinerario.esPrivado == 0, FECHA_ORDEN <= '2024-06-01',
+            db.tuple_(FECHA_ORDEN, Itinerario.idItinerario) < db.tuple_('2024-06-01', 1))
+            .order_by(FECHA_ORDEN.desc(), Itinerario.idItinerario.desc()).limit(51)),
+        ('itinerarios.mis_itinerarios', Itinerario.query.filter_by(idUsuario=1)
+            .order_by(FECHA_ORDEN.desc(), Itinerario.idItinerario.desc()).limit(51)),
+        ('itinerarios.resumen_etapas', db.session.query(Etapa.idItinerario, db.func.count(Etapa.idEtapa))
+            .filter(Etapa.idItinerario.in_([1, 2, 3])).group_by(Etapa.idItinerario)),
+        ('itinerarios.detalle', Etapa.query.filter_by(idItinerario=1).order_by(Etapa.orden)),
+        ('etapas.crear', db.session.query(db.func.max(Etapa.orden)).filter_by(idItinerario=1)),
+        ('etapas.subir', Etapa.query.filter(Etapa.idItinerario == 1, Etapa.orden < 5)
+            .order_by(Etapa.orden.desc()).limit(1)),
+        ('lugares.index', LugarInteres.query.order_by(LugarInteres.nombre, LugarInteres.idLugarInteres)
+            .limit(51)),
+        ('lugares.buscar', db.session.query(LugarInteres.idLugarInteres, Provincia.nombre)
+            .outerjoin(Provincia, Provincia.idProvincia == LugarInteres.idProvincia)
+            .filter(LugarInteres.idProvincia == 1, LugarInteres.categoria == 'Alojamiento')
+            .order_by(LugarInteres.nombre, LugarInteres.idLugarInteres).limit(51)),
+        ('lugares.por_provincia', db.session.query(LugarInteres.idLugarInteres, Ciudad.nombre)
+            .outerjoin(Ciudad, Ciudad.idCiudad == LugarInteres.idCiudad)
+            .filter(LugarInteres.idProvincia == 1)
+            .order_by(LugarInteres.nombre, LugarInteres.idLugarInteres).limit(51)),
+        ('cargar_lugares (ciudad)', Ciudad.query.filter_by(nombre='Salta', idProvincia=1)),
+    ]
+
+@click.command('reporte-indices')
+@with_appcontext
+def reporte_indices_command():
+    """Muestra el EXPLAIN QUERY PLAN de las consultas de cada ruta."""
+    if db.engine.dialect.name != 'sqlite':
+        print("El reporte solo está disponible en SQLite.")
+        return
+
+    sin_indice = 0
+    for ruta, query in _consultas_por_ruta():
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)).all()
+        detalles = [fila[-1] for fila in plan]
+        # Un SCAN sin índice recorre la tabla completa
+        recorre_tabla = [d for d in detalles if d.startswith('SCAN') and 'INDEX' not in d]
+        sin_indice += bool(recorre_tabla)
+        print(f"{'⚠' if recorre_tabla else '✓'} {ruta}")
+        for detalle in detalles:
+            print(f"    {detalle}")
+
+    print(f"\n{sin_indice} consulta(s) recorren una tabla completa.")
+
+@click.command('generar-datos')
+@click.option('--usuarios', default=100, show_default=True, help='Usuarios planificadores a crear.')
+@click.option('--lugares', default=1000, show_default=True, help='Lugares de interés a crear.')
+@click.option('--itinerarios', default=1000, show_default=True, help='Itinerarios a crear.')
+@click.option('--etapas', default=10000, show_default=True, help='Etapas en total (al menos una por itinerario).')
+@click.option('--semilla', default=42, show_default=True, help='Semilla del generador aleatorio.')
+@with_appcontext
+def generar_datos_command(usuarios, lugares, itinerarios, etapas, semilla):
+    """Agrega datos sintéticos (usuarios, lugares, itinerarios y etapas) para pruebas de carga."""
+    import os
+    import time
+    from app.datos_sinteticos import generar_datos
+
+    print(f"Generando datos sintéticos (semilla {semilla})...")
+    inicio = time.perf_counter()
+    try:
+        with db.engine.begin() as connection:
+            generar_datos(connection, usuarios=usuarios, lugares=lugares, itinerarios=itinerarios,
+                          etapas=etapas, semilla=semilla,
+                          password=os.getenv('DEFAULT_PASSWORD') or 'password')
+    except Exception as e:
+        print(f"\nError al generar los datos: {e}")
+        return
+    print(f"\n¡Listo! Datos generados en {time.perf_counter() - inicio:.1f}s.")
+
 def init_app(app):
     """Registra los comandos en la aplicación."""
     app.cli.add_command(backfill_orden_command)
+    app.cli.add_command(convertir_datasets_command)
+    app.cli.add_command(reindexar_lugares_command)
+    app.cli.add_command(normalizar_nombres_command)
+    app.cli.add_command(migrar_command)
+    app.cli.add_command(reporte_indices_command)
+    app.cli.add_command(generar_datos_command)
 
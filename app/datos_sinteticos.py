@@ -0,0 +1,191 @@
+"""
+Generador de datos sintéticos para pruebas de carga y escalabilidad
+
+Agrega a la base usuarios, lugares de interés, itinerarios y etapas con
+volúmenes configurables. Usa el catálogo real de provincias y ciudades de
+data/provincias.py y un generador aleatorio con semilla, así la misma
+semilla produce siempre los mismos datos. Inserta por conjuntos
+(executemany) con ids precalculados a partir de los máximos actuales,
+todo en una sola transacción.
+"""
+import random
+import time
+from datetime import date, timedelta
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import Usuario, Rol, Itinerario, Etapa, Provincia, Ciudad, LugarInteres
+from app.orden_etapas import ESPACIO
+from app.utils import normalizar_texto
+
+TAMANIO_LOTE = 10000
+FUENTE = 'sintetico'
+
+NOMBRES = ['Juan', 'María', 'Lucía', 'Martín', 'Sofía', 'Mateo', 'Valentina', 'Santiago', 'Camila',
+           'Benjamín', 'Julieta', 'Tomás', 'Agustina', 'Facundo', 'Florencia', 'Nicolás', 'Milagros']
+APELLIDOS = ['González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez',
+             'García', 'Sánchez', 'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Benítez']
+
+# Categoría -> (prefijos, palabras) para armar nombres de lugares
+LUGARES = {
+    'Alojamiento': (['Hotel', 'Hostería', 'Cabañas', 'Hostel', 'Posada', 'Apart'],
+                    ['del Sol', 'Los Álamos', 'El Mirador', 'La Cumbre', 'Del Lago', 'San Martín', 'Las Piedras']),
+    'Fiesta/Evento': (['Fiesta Nacional de', 'Fiesta Provincial de', 'Festival de', 'Encuentro de'],
+                      ['la Vendimia', 'la Nieve', 'el Poncho', 'la Tradición', 'el Chamamé', 'la Cerveza']),
+    'Parque Nacional': (['Parque Nacional', 'Reserva Natural', 'Monumento Natural'],
+                        ['Los Cardones', 'El Palmar', 'Quebrada Grande', 'Los Glaciares', 'Talampaya']),
+}
+
+TITULOS = ['Recorriendo {provincia}', '{provincia} en familia', 'Escapada a {provincia}',
+           'Lo mejor de {provincia}', '{provincia} de mochilero', 'Vacaciones en {provincia}']
+ACTIVIDADES = ['Llegada a {ciudad} y check-in.', 'Recorrido por el centro de {ciudad}.',
+               'Excursión de día completo desde {ciudad}.', 'Visita a museos y mercados de {ciudad}.',
+               'Día libre en {ciudad}.', 'Traslado a {ciudad} y paseo al atardecer.']
+
+
+def _siguiente_id(connection, columna):
+    return (connection.execute(db.select(db.func.max(columna))).scalar() or 0) + 1
+
+
+def _insertar(connection, tabla, filas):
+    """Inserta las filas (dicts) en lotes con executemany"""
+    for inicio in range(0, len(filas), TAMANIO_LOTE):
+        connection.execute(tabla.insert(), filas[inicio:inicio + TAMANIO_LOTE])
+
+
+def _catalogo(connection):
+    """Devuelve {idProvincia: (nombre, [(idCiudad, nombre), ...])}, cargando el catálogo si falta"""
+    from data.provincias import provincias_data
+
+    if not connection.execute(db.select(db.func.count()).select_from(Provincia.__table__)).scalar():
+        id_provincia = _siguiente_id(connection, Provincia.idProvincia)
+        id_ciudad = _siguiente_id(connection, Ciudad.idCiudad)
+        provincias, ciudades = [], []
+        for i, prov_data in enumerate(provincias_data):
+            provincias.append({'idProvincia': id_provincia + i, 'nombre': prov_data['nombre'],
+                               'nombreNormalizado': normalizar_texto(prov_data['nombre'])})
+            for nombre in prov_data['ciudades']:
+                ciudades.append({'idCiudad': id_ciudad + len(ciudades), 'idProvincia': id_provincia + i,
+                                 'nombre': nombre, 'nombreNormalizado': normalizar_texto(nombre)})
+        _insertar(connection, Provincia.__table__, provincias)
+        _insertar(connection, Ciudad.__table__, ciudades)
+
+    catalogo = {
+        id_provincia: (nombre, [])
+        for id_provincia, nombre in connection.execute(db.select(Provincia.idProvincia, Provincia.nombre))
+    }
+    for id_ciudad, id_provincia, nombre in connection.execute(
+            db.select(Ciudad.idCiudad, Ciudad.idProvincia, Ciudad.nombre).order_by(Ciudad.idCiudad)):
+        catalogo[id_provincia][1].append((id_ciudad, nombre))
+    # Solo provincias con ciudades, para poder ubicar lugares y etapas
+    return {k: v for k, v in catalogo.items() if v[1]}
+
+
+def generar_datos(connection, usuarios=100, lugares=1000, itinerarios=1000, etapas=10000,
+                  semilla=42, password='password', informar=print):
+    """Genera los volúmenes pedidos usando la conexión. Devuelve un dict con las cantidades.
+
+    Cada itinerario tiene al menos una etapa: si se piden itinerarios, hacen
+    falta usuarios y al menos tantas etapas como itinerarios (ValueError si no).
+    """
+    if itinerarios and not usuarios:
+        raise ValueError('Para crear itinerarios hace falta al menos un usuario.')
+    if etapas < itinerarios:
+        raise ValueError(f'Se pidieron {etapas:,} etapas para {itinerarios:,} itinerarios: '
+                         'cada itinerario necesita al menos una etapa.')
+    if etapas and not itinerarios:
+        raise ValueError('Para crear etapas hace falta al menos un itinerario.')
+    rng = random.Random(semilla)
+    catalogo = _catalogo(connection)
+    id_provincias = sorted(catalogo)
+
+    # Usuarios planificadores (comparten la contraseña: un solo hash)
+    inicio = time.perf_counter()
+    id_rol = connection.execute(db.select(Rol.idRol).where(Rol.titulo == 'Planificador')).scalar()
+    if id_rol is None:
+        id_rol = _siguiente_id(connection, Rol.idRol)
+        connection.execute(Rol.__table__.insert(), [{'idRol': id_rol, 'titulo': 'Planificador'}])
+    hash_password = generate_password_hash(password)
+    primer_usuario = _siguiente_id(connection, Usuario.idUsuario)
+    filas = []
+    for id_usuario in range(primer_usuario, primer_usuario + usuarios):
+        nombre, apellido = rng.choice(NOMBRES), rng.choice(APELLIDOS)
+        nacimiento = date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 55))
+        filas.append({
+            'idUsuario': id_usuario, 'idRol': id_rol, 'nombre': nombre, 'apellido': apellido,
+            'fechaNacimiento': nacimiento.isoformat(), 'hashPassword': hash_password,
+            'email': f'{normalizar_texto(nombre)}.{normalizar_texto(apellido)}.{id_usuario}@ejemplo.com',
+        })
+    _insertar(connection, Usuario.__table__, filas)
+    informar(f"  ✓ {usuarios:,} usuarios ({time.perf_counter() - inicio:.1f}s)")
+
+    # Lugares de interés, repartidos por provincia y ciudad
+    inicio = time.perf_counter()
+    primer_lugar = _siguiente_id(connection, LugarInteres.idLugarInteres)
+    lugares_por_provincia = {id_provincia: [] for id_provincia in id_provincias}
+    filas = []
+    for id_lugar in range(primer_lugar, primer_lugar + lugares):
+        id_provincia = rng.choice(id_provincias)
+        id_ciudad, ciudad = rng.choice(catalogo[id_provincia][1])
+        categoria = rng.choice(list(LUGARES))
+        prefijos, palabras = LUGARES[categoria]
+        nombre = f'{rng.choice(prefijos)} {rng.choice(palabras)} {ciudad}'
+        filas.append({
+            'idLugarInteres': id_lugar, 'nombre': nombre, 'nombreNormalizado': normalizar_texto(nombre),
+            'categoria': categoria, 'idProvincia': id_provincia,
+            'idCiudad': None if categoria == 'Parque Nacional' else id_ciudad,
+            'fuente': FUENTE, 'identificadorExterno': str(id_lugar),
+            'enlaceFicha': f'https://ejemplo.com/lugares/{id_lugar}',
+        })
+        lugares_por_provincia[id_provincia].append(id_lugar)
+        if len(filas) == TAMANIO_LOTE:
+            _insertar(connection, LugarInteres.__table__, filas)
+            filas = []
+    _insertar(connection, LugarInteres.__table__, filas)
+    informar(f"  ✓ {lugares:,} lugares de interés ({time.perf_counter() - inicio:.1f}s)")
+
+    # Itinerarios, con al menos una etapa cada uno y el resto repartido al azar
+    inicio = time.perf_counter()
+    cantidad_etapas = [1] * itinerarios
+    for _ in range(etapas - itinerarios):
+        cantidad_etapas[rng.randrange(itinerarios)] += 1
+
+    primer_itinerario = _siguiente_id(connection, Itinerario.idItinerario)
+    primera_etapa = _siguiente_id(connection, Etapa.idEtapa)
+    filas_itinerarios, filas_etapas = [], []
+    id_etapa = primera_etapa
+    for i, cantidad in enumerate(cantidad_etapas):
+        id_itinerario = primer_itinerario + i
+        id_provincia = rng.choice(id_provincias)
+        provincia, ciudades = catalogo[id_provincia]
+        lugares_provincia = lugares_por_provincia[id_provincia]
+        fecha_inicio = date(2023, 1, 1) + timedelta(days=rng.randrange(365 * 3))
+        filas_itinerarios.append({
+            'idItinerario': id_itinerario,
+            'idUsuario': primer_usuario + rng.randrange(usuarios),
+            'titulo': rng.choice(TITULOS).format(provincia=provincia),
+            'descripcion': f'Itinerario de {cantidad} días por {provincia}.',
+            'esPrivado': int(rng.random() < 0.3),
+            'fechaInicio': fecha_inicio.isoformat(),
+            'fechaFin': (fecha_inicio + timedelta(days=cantidad - 1)).isoformat(),
+        })
+        for orden in range(1, cantidad + 1):
+            id_ciudad, ciudad = rng.choice(ciudades)
+            dia = (fecha_inicio + timedelta(days=orden - 1)).isoformat()
+            filas_etapas.append({
+                'idEtapa': id_etapa, 'idItinerario': id_itinerario, 'orden': orden * ESPACIO,
+                'idCiudad': id_ciudad,
+                'idLugarInteres': rng.choice(lugares_provincia) if lugares_provincia and rng.random() < 0.5 else None,
+                'actividadDelDia': rng.choice(ACTIVIDADES).format(ciudad=ciudad),
+                'fechaInicio': dia, 'fechaFin': dia,
+                'notaPersonal': None,
+            })
+            id_etapa += 1
+        if len(filas_etapas) >= TAMANIO_LOTE:
+            _insertar(connection, Itinerario.__table__, filas_itinerarios)
+            _insertar(connection, Etapa.__table__, filas_etapas)
+            filas_itinerarios, filas_etapas = [], []
+    _insertar(connection, Itinerario.__table__, filas_itinerarios)
+    _insertar(connection, Etapa.__table__, filas_etapas)
+    informar(f"  ✓ {itinerarios:,} itinerarios y {etapas:,} etapas ({time.perf_counter() - inicio:.1f}s)")
+
+    return {'usuarios': usuarios, 'lugares': lugares, 'itinerarios': itinerarios, 'etapas': etapas}
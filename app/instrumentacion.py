@@ -0,0 +1,121 @@
+"""
+Instrumentación de las consultas SQL de cada petición
+
+Escucha los eventos del engine de `db` y, dentro de una petición, acumula
+la cantidad de consultas, el tiempo total en la base y las consultas más
+lentas. Al terminar la petición agrega el encabezado `Server-Timing` y
+suma los valores a las estadísticas por endpoint. Las consultas que
+superan SQL_UMBRAL_LENTA_MS se registran en el log con el endpoint.
+"""
+import heapq
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+# Consultas más lentas que se guardan por petición y por endpoint
+MAX_LENTAS = 5
+# Largo máximo del SQL que se guarda de cada consulta
+MAX_SQL = 300
+
+
+class EstadisticasConsultas:
+    """Estadísticas de consultas SQL acumuladas por endpoint. Es seguro compartirlo entre hilos."""
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint, consultas, segundos, lentas):
+        """Suma una petición del endpoint: cantidad de consultas, tiempo en la base y sus consultas más lentas"""
+        with self._lock:
+            datos = self._endpoints.setdefault(endpoint, {
+                'peticiones': 0, 'consultas': 0, 'max_consultas': 0,
+                'segundos': 0.0, 'max_segundos': 0.0, 'lentas': [],
+            })
+            datos['peticiones'] += 1
+            datos['consultas'] += consultas
+            datos['max_consultas'] = max(datos['max_consultas'], consultas)
+            datos['segundos'] += segundos
+            datos['max_segundos'] = max(datos['max_segundos'], segundos)
+            for lenta in lentas:
+                if len(datos['lentas']) < MAX_LENTAS:
+                    heapq.heappush(datos['lentas'], lenta)
+                else:
+                    heapq.heappushpop(datos['lentas'], lenta)
+
+    def resumen(self):
+        """Devuelve las estadísticas por endpoint, de mayor a menor tiempo total en la base"""
+        with self._lock:
+            copia = {endpoint: dict(datos, lentas=list(datos['lentas']))
+                     for endpoint, datos in self._endpoints.items()}
+        endpoints = []
+        for endpoint, datos in sorted(copia.items(), key=lambda item: -item[1]['segundos']):
+            endpoints.append({
+                'endpoint': endpoint,
+                'peticiones': datos['peticiones'],
+                'consultas_promedio': round(datos['consultas'] / datos['peticiones'], 2),
+                'consultas_max': datos['max_consultas'],
+                'db_ms_promedio': round(datos['segundos'] * 1000 / datos['peticiones'], 3),
+                'db_ms_max': round(datos['max_segundos'] * 1000, 3),
+                'db_ms_total': round(datos['segundos'] * 1000, 3),
+                'mas_lentas': [{'ms': round(segundos * 1000, 3), 'sql': sql}
+                               for segundos, sql in sorted(datos['lentas'], reverse=True)],
+            })
+        return endpoints
+
+    def reiniciar(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+# Instancia compartida por toda la aplicación
+estadisticas_sql = EstadisticasConsultas()
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._inicio_consulta = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_inicio_consulta', None)
+    if inicio is None or not has_request_context():
+        return
+    segundos = time.perf_counter() - inicio
+
+    consultas = g.setdefault('consultas_sql', {'cantidad': 0, 'segundos': 0.0, 'lentas': []})
+    consultas['cantidad'] += 1
+    consultas['segundos'] += segundos
+    lenta = (segundos, ' '.join(statement.split())[:MAX_SQL])
+    if len(consultas['lentas']) < MAX_LENTAS:
+        heapq.heappush(consultas['lentas'], lenta)
+    else:
+        heapq.heappushpop(consultas['lentas'], lenta)
+
+    umbral = current_app.config['SQL_UMBRAL_LENTA_MS']
+    if umbral is not None and segundos * 1000 >= umbral:
+        current_app.logger.warning('Consulta lenta (%.1f ms) en %s: %s', segundos * 1000,
+                                   request.endpoint, lenta[1])
+
+
+def _registrar_peticion(response):
+    """Agrega el encabezado Server-Timing y suma la petición a las estadísticas de su endpoint"""
+    consultas = g.pop('consultas_sql', {'cantidad': 0, 'segundos': 0.0, 'lentas': []})
+    response.headers.add('Server-Timing',
+                         f'db;dur={consultas["segundos"] * 1000:.3f};desc="{consultas["cantidad"]} consultas"')
+    if request.endpoint and request.endpoint != 'static':
+        estadisticas_sql.registrar(request.endpoint, consultas['cantidad'], consultas['segundos'],
+                                   consultas['lentas'])
+    return response
+
+
+def instrumentar(app):
+    """Instala la instrumentación de consultas en el engine de la app y en sus peticiones"""
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _antes_de_ejecutar):
+        event.listen(engine, 'before_cursor_execute', _antes_de_ejecutar)
+        event.listen(engine, 'after_cursor_execute', _despues_de_ejecutar)
+    app.after_request(_registrar_peticion)
@@ -0,0 +1,192 @@
+"""
+Migraciones versionadas del esquema de la base de datos
+
+Cada migración tiene un número de versión y una función que recibe una
+conexión dentro de una transacción. Las versiones aplicadas se registran
+en la tabla version_esquema. Las funciones son idempotentes: verifican lo
+que ya existe, así pueden aplicarse sobre bases creadas con db.create_all().
+
+init_db.py crea el esquema completo y marca todas las versiones como
+aplicadas; en bases existentes se aplican con `flask migrar`.
+"""
+from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+from app import db
+from app.utils import normalizar_texto
+
+TABLA_VERSIONES = 'version_esquema'
+
+
+def _crear_indices(connection, modelo, nombres):
+    """Crea (si no existen) los índices del modelo con los nombres indicados"""
+    # IF NOT EXISTS en lugar de checkfirst: la reflexión omite los índices sobre expresiones
+    for indice in modelo.__table__.indexes:
+        if indice.name in nombres:
+            connection.execute(CreateIndex(indice, if_not_exists=True))
+
+
+def completar_nombres_normalizados(connection):
+    """Agrega nombreNormalizado a provincia, ciudad y lugar_interes y lo completa"""
+    from app.models import Provincia, Ciudad, LugarInteres
+
+    for modelo in (Provincia, Ciudad, LugarInteres):
+        tabla = modelo.__table__
+        columnas = [c['name'] for c in inspect(connection).get_columns(tabla.name)]
+        if 'nombreNormalizado' not in columnas:
+            tipo = tabla.c.nombreNormalizado.type.compile(connection.dialect)
+            connection.exec_driver_sql(f'ALTER TABLE {tabla.name} ADD COLUMN "nombreNormalizado" {tipo}')
+        _crear_indices(connection, modelo, {f'ix_{tabla.name}_nombreNormalizado'})
+
+        clave = tabla.primary_key.columns.values()[0]
+        filas = connection.execute(db.select(clave, tabla.c.nombre)).all()
+        if filas:
+            connection.execute(
+                tabla.update().where(clave == db.bindparam('_id')),
+                [{'_id': id, 'nombreNormalizado': normalizar_texto(nombre)} for id, nombre in filas]
+            )
+
+
+def _indice_fts(connection):
+    """Crea el índice FTS5 de lugares y lo llena con los lugares existentes"""
+    from app.busqueda import crear_indice_fts, llenar_indice_fts
+
+    if connection.dialect.name != 'sqlite':
+        return
+    crear_indice_fts(connection)
+    llenar_indice_fts(connection)
+
+
+def _indices_paginacion_lugares(connection):
+    """Índices para la paginación por cursor de lugares"""
+    from app.models import LugarInteres
+
+    _crear_indices(connection, LugarInteres, {
+        'ix_lugar_interes_nombre_id',
+        'ix_lugar_interes_provincia_nombre_id',
+        'ix_lugar_interes_provincia_categoria_nombre_id',
+    })
+
+
+def _indices_filtros_frecuentes(connection):
+    """Índices compuestos para los filtros de itinerarios, etapas y ciudades"""
+    from app.models import Itinerario, Etapa, Ciudad
+
+    _crear_indices(connection, Itinerario, {'ix_itinerario_usuario_fecha', 'ix_itinerario_privado_usuario'})
+    _crear_indices(connection, Etapa, {'ix_etapa_itinerario_orden'})
+    _crear_indices(connection, Ciudad, {'ix_ciudad_provincia_nombre'})
+
+
+def _clave_sincronizacion_lugares(connection):
+    """Agrega hashContenido y la clave única (categoria, fuente, identificadorExterno)"""
+    from app.models import LugarInteres
+
+    tabla = LugarInteres.__table__
+    columnas = [c['name'] for c in inspect(connection).get_columns(tabla.name)]
+    if 'hashContenido' not in columnas:
+        tipo = tabla.c.hashContenido.type.compile(connection.dialect)
+        connection.exec_driver_sql(f'ALTER TABLE {tabla.name} ADD COLUMN "hashContenido" {tipo}')
+
+    # Los identificadores vacíos (o 'nan' del cargador anterior) pasan a NULL, y si hay
+    # repetidos se conserva el identificador solo en el lugar más antiguo
+    connection.exec_driver_sql(
+        "UPDATE lugar_interes SET identificadorExterno = NULL WHERE identificadorExterno IN ('', 'nan')"
+    )
+    connection.exec_driver_sql("""
+        UPDATE lugar_interes SET identificadorExterno = NULL
+        WHERE identificadorExterno IS NOT NULL AND idLugarInteres NOT IN (
+            SELECT min(idLugarInteres) FROM lugar_interes
+            WHERE identificadorExterno IS NOT NULL
+            GROUP BY categoria, fuente, identificadorExterno
+        )
+    """)
+    _crear_indices(connection, LugarInteres, {'ux_lugar_interes_categoria_fuente_externo'})
+
+
+def _indices_listados_itinerarios(connection):
+    """Índices de los listados de itinerarios paginados por fecha"""
+    from app.models import Itinerario
+
+    _crear_indices(connection, Itinerario, {
+        'ix_itinerario_privado_fecha_id',
+        'ix_itinerario_fecha_id',
+        'ix_itinerario_usuario_fecha_id',
+    })
+
+
+def _registro_cargas(connection):
+    """Crea la tabla de registro de corridas de carga de archivos"""
+    from app.models import CargaArchivo
+
+    CargaArchivo.__table__.create(connection, checkfirst=True)
+
+
+def _indice_lugares_por_ciudad(connection):
+    """Índice de lugares por ciudad para la búsqueda sin FTS5"""
+    from app.models import LugarInteres
+
+    _crear_indices(connection, LugarInteres, {'ix_lugar_interes_ciudad'})
+
+
+# (versión, descripción, función) en orden de aplicación
+MIGRACIONES = [
+    (1, 'Nombres normalizados para búsquedas', completar_nombres_normalizados),
+    (2, 'Índice FTS5 de lugares de interés', _indice_fts),
+    (3, 'Índices de paginación de lugares', _indices_paginacion_lugares),
+    (4, 'Índices compuestos de filtros frecuentes', _indices_filtros_frecuentes),
+    (5, 'Clave de sincronización de lugares', _clave_sincronizacion_lugares),
+    (6, 'Registro de cargas de archivos', _registro_cargas),
+    (7, 'Índices de listados de itinerarios por fecha', _indices_listados_itinerarios),
+    (8, 'Índice de lugares por ciudad', _indice_lugares_por_ciudad),
+]
+
+
+def _tabla_versiones():
+    return db.table(TABLA_VERSIONES, db.column('version'), db.column('descripcion'), db.column('aplicada'))
+
+
+def _asegurar_tabla_versiones(connection):
+    connection.exec_driver_sql(
+        f'CREATE TABLE IF NOT EXISTS {TABLA_VERSIONES} ('
+        'version INTEGER PRIMARY KEY, descripcion VARCHAR(200) NOT NULL, aplicada VARCHAR(50) NOT NULL)'
+    )
+
+
+def versiones_aplicadas():
+    """Devuelve el conjunto de versiones ya aplicadas"""
+    with db.engine.begin() as connection:
+        _asegurar_tabla_versiones(connection)
+        return {v for (v,) in connection.execute(db.select(_tabla_versiones().c.version))}
+
+
+def _registrar(connection, version, descripcion):
+    connection.execute(_tabla_versiones().insert().values(
+        version=version, descripcion=descripcion, aplicada=datetime.now().isoformat(timespec='seconds')
+    ))
+
+
+def aplicar_migraciones():
+    """Aplica, cada una en su transacción, las migraciones pendientes. Devuelve las aplicadas."""
+    aplicadas = versiones_aplicadas()
+    nuevas = []
+    for version, descripcion, migracion in MIGRACIONES:
+        if version in aplicadas:
+            continue
+        with db.engine.begin() as connection:
+            migracion(connection)
+            _registrar(connection, version, descripcion)
+        nuevas.append((version, descripcion))
+    return nuevas
+
+
+def marcar_como_aplicadas(connection=None):
+    """Registra todas las migraciones como aplicadas (esquema creado con create_all)"""
+    if connection is None:
+        with db.engine.begin() as connection:
+            return marcar_como_aplicadas(connection)
+
+    _asegurar_tabla_versiones(connection)
+    aplicadas = {v for (v,) in connection.execute(db.select(_tabla_versiones().c.version))}
+    for version, descripcion, _ in MIGRACIONES:
+        if version not in aplicadas:
+            _registrar(connection, version, descripcion)
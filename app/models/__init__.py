@@ -1,10 +1,12 @@
 from app.models.usuario import Usuario, Rol
 from app.models.itinerario import Itinerario, Etapa
 from app.models.lugares import Ciudad, Provincia, Aeropuerto, ParqueNacional, LugarInteres
+from app.models.carga import CargaArchivo
 
 __all__ = [
     'Usuario', 'Rol',
     'Itinerario', 'Etapa',
-    'Ciudad', 'Provincia', 'Aeropuerto', 'ParqueNacional', 'LugarInteres'
+    'Ciudad', 'Provincia', 'Aeropuerto', 'ParqueNacional', 'LugarInteres',
+    'CargaArchivo'
 ]
 
@@ -0,0 +1,27 @@
+from app import db
+
+
+class CargaArchivo(db.Model):
+    """Registro de una corrida de carga de un archivo de datos (cargar_lugares.py)"""
+    __tablename__ = 'carga_archivo'
+    __table_args__ = (
+        # Última corrida de un archivo, para reanudar u omitir
+        db.Index('ix_carga_archivo_archivo_categoria_modo', 'archivo', 'categoria', 'modo', 'idCarga'),
+    )
+
+    idCarga = db.Column(db.Integer, primary_key=True)
+    archivo = db.Column(db.String(200), nullable=False)
+    categoria = db.Column(db.String(100), nullable=False)
+    modo = db.Column(db.String(20), nullable=False)  # 'carga' o 'sincronizacion'
+    checksum = db.Column(db.String(64), nullable=False)  # SHA-256 del archivo
+    tamanioLote = db.Column(db.Integer, nullable=True)  # Filas por lote (None = archivo completo)
+    estado = db.Column(db.String(20), nullable=False, default='en_curso')  # 'en_curso', 'completa', 'fallida'
+    lotesConfirmados = db.Column(db.Integer, nullable=False, default=0)
+    filasLeidas = db.Column(db.Integer, nullable=False, default=0)
+    filasCargadas = db.Column(db.Integer, nullable=False, default=0)
+    inicio = db.Column(db.String(50), nullable=False)
+    fin = db.Column(db.String(50), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<CargaArchivo {self.archivo} ({self.estado}, {self.lotesConfirmados} lotes)>'
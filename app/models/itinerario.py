@@ -4,6 +4,11 @@ from datetime import datetime
 class Itinerario(db.Model):
     """Modelo para los itinerarios de viaje"""
     __tablename__ = 'itinerario'
+    __table_args__ = (
+        # Mis itinerarios (por usuario, ordenados por fecha) y listado de públicos
+        db.Index('ix_itinerario_usuario_fecha', 'idUsuario', 'fechaInicio'),
+        db.Index('ix_itinerario_privado_usuario', 'esPrivado', 'idUsuario'),
+    )
     
     idItinerario = db.Column(db.Integer, primary_key=True)
     idUsuario = db.Column(db.Integer, db.ForeignKey('usuario.idUsuario'), nullable=False)
@@ -24,9 +29,23 @@ class Itinerario(db.Model):
         return f'<Itinerario {self.titulo}>'
 
 
+# Clave de orden por fecha de los listados: los itinerarios sin fecha cuentan como ''
+# (literal y no parámetro, para que SQLite use los índices de esta expresión)
+FECHA_ORDEN = db.func.coalesce(Itinerario.fechaInicio, db.literal_column("''"))
+
+# Listados paginados por fecha: públicos, todos (administrador) y de un usuario
+db.Index('ix_itinerario_privado_fecha_id', Itinerario.esPrivado, FECHA_ORDEN, Itinerario.idItinerario)
+db.Index('ix_itinerario_fecha_id', FECHA_ORDEN, Itinerario.idItinerario)
+db.Index('ix_itinerario_usuario_fecha_id', Itinerario.idUsuario, FECHA_ORDEN, Itinerario.idItinerario)
+
+
 class Etapa(db.Model):
     """Modelo para las etapas (días) de un itinerario"""
     __tablename__ = 'etapa'
+    __table_args__ = (
+        # Etapas de un itinerario en orden (detalle, subir/bajar, máximo orden)
+        db.Index('ix_etapa_itinerario_orden', 'idItinerario', 'orden'),
+    )
     
     idEtapa = db.Column(db.Integer, primary_key=True)
     idItinerario = db.Column(db.Integer, db.ForeignKey('itinerario.idItinerario'), nullable=False)
@@ -1,4 +1,7 @@
+from sqlalchemy import event
+from sqlalchemy.orm import validates
 from app import db
+from app.utils import normalizar_texto
 
 class Provincia(db.Model):
     """Modelo para las provincias de Argentina"""
@@ -6,11 +9,18 @@ class Provincia(db.Model):
     
     idProvincia = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False, unique=True)
+    nombreNormalizado = db.Column(db.String(100), nullable=True, index=True)  # Sin acentos, minúsculas
     
     # Relaciones
     ciudades = db.relationship('Ciudad', backref='provincia', lazy=True, cascade='all, delete-orphan')
     parques_nacionales = db.relationship('ParqueNacional', backref='provincia', lazy=True, cascade='all, delete-orphan')
     
+    @validates('nombre')
+    def _normalizar_nombre(self, key, value):
+        """Mantiene nombreNormalizado sincronizado con nombre"""
+        self.nombreNormalizado = normalizar_texto(value)
+        return value
+    
     def __repr__(self):
         return f'<Provincia {self.nombre}>'
 
@@ -18,15 +28,26 @@ class Provincia(db.Model):
 class Ciudad(db.Model):
     """Modelo para las ciudades de Argentina"""
     __tablename__ = 'ciudad'
+    __table_args__ = (
+        # Búsqueda de ciudad por provincia y nombre (carga de lugares, formularios)
+        db.Index('ix_ciudad_provincia_nombre', 'idProvincia', 'nombre'),
+    )
     
     idCiudad = db.Column(db.Integer, primary_key=True)
     idProvincia = db.Column(db.Integer, db.ForeignKey('provincia.idProvincia'), nullable=False)
     nombre = db.Column(db.String(100), nullable=False)
+    nombreNormalizado = db.Column(db.String(100), nullable=True, index=True)  # Sin acentos, minúsculas
     
     # Relaciones
     aeropuertos = db.relationship('Aeropuerto', backref='ciudad', lazy=True, cascade='all, delete-orphan')
     etapas = db.relationship('Etapa', backref='ciudad', lazy=True)
     
+    @validates('nombre')
+    def _normalizar_nombre(self, key, value):
+        """Mantiene nombreNormalizado sincronizado con nombre"""
+        self.nombreNormalizado = normalizar_texto(value)
+        return value
+    
     def __repr__(self):
         return f'<Ciudad {self.nombre}>'
 
@@ -58,20 +79,52 @@ class ParqueNacional(db.Model):
 class LugarInteres(db.Model):
     """Modelo genérico para lugares de interés (Parques Nacionales, Alojamientos, Fiestas, etc.)"""
     __tablename__ = 'lugar_interes'
+    __table_args__ = (
+        # Paginación por cursor: orden por nombre e id, globalmente y por provincia/categoría
+        db.Index('ix_lugar_interes_nombre_id', 'nombre', 'idLugarInteres'),
+        db.Index('ix_lugar_interes_provincia_nombre_id', 'idProvincia', 'nombre', 'idLugarInteres'),
+        db.Index('ix_lugar_interes_provincia_categoria_nombre_id',
+                 'idProvincia', 'categoria', 'nombre', 'idLugarInteres'),
+        # Búsqueda sin FTS5 por nombre de ciudad (lugares de las ciudades que coinciden)
+        db.Index('ix_lugar_interes_ciudad', 'idCiudad'),
+        # Clave de sincronización con el dataset de origen (los ids se repiten entre datasets)
+        db.Index('ux_lugar_interes_categoria_fuente_externo',
+                 'categoria', 'fuente', 'identificadorExterno', unique=True),
+    )
     
     idLugarInteres = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(200), nullable=False)
+    nombreNormalizado = db.Column(db.String(200), nullable=True, index=True)  # Sin acentos, minúsculas
     categoria = db.Column(db.String(100), nullable=False)  # 'Parque Nacional', 'Alojamiento', 'Fiesta/Evento', etc.
     idProvincia = db.Column(db.Integer, db.ForeignKey('provincia.idProvincia'), nullable=True)
     idCiudad = db.Column(db.Integer, db.ForeignKey('ciudad.idCiudad'), nullable=True)
     fuente = db.Column(db.String(200), nullable=True)  # Ej: 'datos.gob.ar'
     identificadorExterno = db.Column(db.String(100), nullable=True)  # ID en el dataset original
     enlaceFicha = db.Column(db.String(500), nullable=True)  # URL a la ficha del lugar
+    hashContenido = db.Column(db.String(40), nullable=True)  # SHA-1 de los datos de origen, para sincronizar
     
     # Relaciones
     provincia = db.relationship('Provincia', backref='lugares_interes', lazy=True)
     ciudad = db.relationship('Ciudad', backref='lugares_interes', lazy=True)
     
+    @validates('nombre')
+    def _normalizar_nombre(self, key, value):
+        """Mantiene nombreNormalizado sincronizado con nombre"""
+        self.nombreNormalizado = normalizar_texto(value)
+        return value
+    
     def __repr__(self):
         return f'<LugarInteres {self.nombre} ({self.categoria})>'
 
+
+# Índice FTS5 de búsqueda: se crea y elimina junto con la tabla lugar_interes
+@event.listens_for(LugarInteres.__table__, 'after_create')
+def _crear_indice_fts(target, connection, **kw):
+    from app.busqueda import crear_indice_fts
+    crear_indice_fts(connection)
+
+
+@event.listens_for(LugarInteres.__table__, 'before_drop')
+def _eliminar_indice_fts(target, connection, **kw):
+    from app.busqueda import eliminar_indice_fts
+    eliminar_indice_fts(connection)
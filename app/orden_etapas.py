@@ -0,0 +1,90 @@
+"""
+Orden de las etapas de un itinerario con claves espaciadas
+
+Los valores de `orden` se asignan con saltos de ESPACIO (1024, 2048, ...),
+así una etapa se puede mover a cualquier posición con un único UPDATE,
+tomando un valor entre los de sus nuevos vecinos. Cuando entre dos vecinos
+ya no queda lugar, se rebalancea el itinerario: se renumeran todas sus
+etapas con el salto completo. Las etapas numeradas 1, 2, 3... (anteriores a
+este esquema) se rebalancean en el primer movimiento que lo necesite, y
+las etapas sin orden (NULL) se rebalancean antes de moverlas o de mover
+otra etapa del itinerario: quedan al final, como en `flask backfill-orden`.
+"""
+from app import db
+from app.cache_catalogo import etiqueta_itinerario
+from app.models import Etapa
+
+ESPACIO = 1024
+
+
+def orden_entre(anterior, siguiente):
+    """Valor de orden entre los de dos vecinos (None en un extremo), o None si no hay lugar"""
+    if anterior is None and siguiente is None:
+        return ESPACIO
+    if anterior is None:
+        return siguiente - ESPACIO
+    if siguiente is None:
+        return anterior + ESPACIO
+    if siguiente - anterior < 2:
+        return None
+    return (anterior + siguiente) // 2
+
+
+def orden_al_final(id_itinerario):
+    """Valor de orden para agregar una etapa al final del itinerario"""
+    maximo = db.session.query(db.func.max(Etapa.orden)).filter_by(idItinerario=id_itinerario).scalar()
+    return orden_entre(maximo, None)
+
+
+def rebalancear(id_itinerario):
+    """Renumera las etapas del itinerario con el salto completo, respetando el orden actual"""
+    # Las etapas sin orden van al final (en SQLite NULL se ordena primero)
+    ids = [id_etapa for (id_etapa,) in db.session.query(Etapa.idEtapa)
+           .filter_by(idItinerario=id_itinerario)
+           .order_by(Etapa.orden.is_(None), Etapa.orden, Etapa.idEtapa)]
+    # UPDATE por clave primaria en lote (executemany); solo cambia lo que muestra este itinerario
+    db.session.execute(db.update(Etapa), [
+        {'idEtapa': id_etapa, 'orden': (i + 1) * ESPACIO} for i, id_etapa in enumerate(ids)
+    ], execution_options={'etiquetas_catalogo': (etiqueta_itinerario(id_itinerario),)})
+    # Las etapas del itinerario ya cargadas en la sesión toman los valores nuevos
+    for objeto in list(db.session.identity_map.values()):
+        if isinstance(objeto, Etapa) and objeto.idItinerario == id_itinerario:
+            db.session.expire(objeto, ['orden'])
+    return len(ids)
+
+
+def _vecinos(etapa, posicion):
+    """Valores de orden de las etapas que quedarían antes y después de la posición (desde 1)"""
+    otras = (db.session.query(Etapa.orden)
+             .filter(Etapa.idItinerario == etapa.idItinerario, Etapa.idEtapa != etapa.idEtapa)
+             .order_by(Etapa.orden, Etapa.idEtapa))
+    if posicion == 1:
+        filas = otras.limit(1).all()
+        return None, filas[0][0] if filas else None
+    filas = otras.offset(posicion - 2).limit(2).all()
+    anterior = filas[0][0] if filas else None
+    siguiente = filas[1][0] if len(filas) > 1 else None
+    return anterior, siguiente
+
+
+def mover(etapa, posicion):
+    """Mueve la etapa a la posición indicada (desde 1; se ajusta al rango válido).
+
+    Lee los dos vecinos de la posición destino y actualiza solo la etapa,
+    salvo que haga falta rebalancear. No confirma la transacción.
+    """
+    # count(orden) no cuenta los NULL: si hay etapas sin orden se rebalancea antes de buscar vecinos
+    total, con_orden = (db.session.query(db.func.count(Etapa.idEtapa), db.func.count(Etapa.orden))
+                        .filter_by(idItinerario=etapa.idItinerario).one())
+    if con_orden < total:
+        rebalancear(etapa.idItinerario)
+    posicion = max(1, min(posicion, total))
+
+    anterior, siguiente = _vecinos(etapa, posicion)
+    nuevo = orden_entre(anterior, siguiente)
+    if nuevo is None:
+        rebalancear(etapa.idItinerario)
+        anterior, siguiente = _vecinos(etapa, posicion)
+        nuevo = orden_entre(anterior, siguiente)
+    etapa.orden = nuevo
+    return posicion
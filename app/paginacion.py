@@ -0,0 +1,98 @@
+"""
+Paginación por cursor (keyset) para listados ordenados
+
+El cursor es un token opaco con los valores de las columnas de orden de la
+última fila devuelta; la página siguiente pide las filas estrictamente
+posteriores a esos valores, así el costo no depende de cuántas páginas se
+recorrieron y el orden es estable aunque se agreguen filas.
+"""
+import base64
+import json
+from sqlalchemy import and_, tuple_
+
+TAMANIO_PAGINA = 50
+TAMANIO_MAXIMO = 200
+
+
+class CursorInvalido(ValueError):
+    """El token de cursor recibido no se puede decodificar"""
+
+
+def codificar_cursor(valores):
+    """Convierte los valores de orden de una fila en un token opaco"""
+    datos = json.dumps(list(valores), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(datos).decode('ascii').rstrip('=')
+
+
+def _valor_valido(valor):
+    # Solo escalares que se pueden comparar en la consulta: las columnas de orden nunca son
+    # NULL (None no se puede comparar con < o >), bool no es un valor de orden y los enteros
+    # deben entrar en un INTEGER de 64 bits
+    if isinstance(valor, bool):
+        return False
+    if isinstance(valor, int):
+        return -2 ** 63 <= valor < 2 ** 63
+    return isinstance(valor, (str, float))
+
+
+def decodificar_cursor(token, cantidad=None):
+    """Devuelve la lista de valores codificada en el token.
+
+    cantidad: cantidad de columnas de orden que debe tener el cursor.
+    """
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno))
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido('Cursor inválido') from e
+    if not isinstance(valores, list) or not all(_valor_valido(valor) for valor in valores):
+        raise CursorInvalido('Cursor inválido')
+    if cantidad is not None and len(valores) != cantidad:
+        raise CursorInvalido('Cursor inválido')
+    return valores
+
+
+def tamanio_pagina(valor, por_defecto=TAMANIO_PAGINA):
+    """Normaliza el tamaño de página pedido al rango permitido"""
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    return max(1, min(valor, TAMANIO_MAXIMO))
+
+
+def _posteriores(columnas, valores, descendente):
+    """Condición de las filas que van después de los valores en el orden de las columnas.
+
+    Además de la comparación de tuplas se acota la primera columna por
+    separado: SQLite no usa una comparación de tuplas como rango de un
+    índice cuando la columna es una expresión (por ejemplo coalesce(...)).
+    """
+    if descendente:
+        return and_(columnas[0] <= valores[0], tuple_(*columnas) < tuple_(*valores))
+    return and_(columnas[0] >= valores[0], tuple_(*columnas) > tuple_(*valores))
+
+
+def paginar(query, columnas_orden, cursor=None, limite=TAMANIO_PAGINA, clave=None, descendente=False):
+    """Devuelve (filas, siguiente_cursor) de una página de la consulta.
+
+    columnas_orden: columnas por las que se ordena (todas ascendentes, o
+    todas descendentes con descendente=True), sin valores NULL; la última
+    debe ser única (por ejemplo el id) para que el orden sea total.
+    clave: función que devuelve, para una fila, los valores de esas
+    columnas (por defecto, los primeros elementos de la fila).
+    """
+    if cursor:
+        valores = decodificar_cursor(cursor, len(columnas_orden))
+        query = query.filter(_posteriores(columnas_orden, valores, descendente))
+
+    orden = [columna.desc() for columna in columnas_orden] if descendente else columnas_orden
+    filas = query.order_by(*orden).limit(limite + 1).all()
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        valores = clave(ultima) if clave else tuple(ultima)[:len(columnas_orden)]
+        siguiente = codificar_cursor(valores)
+    return filas, siguiente
@@ -0,0 +1,197 @@
+"""
+Perfilado por muestreo de las peticiones
+
+Un middleware WSGI envuelve la app creada por create_app(). Se perfila una
+petición si PERFILAR está activo (todas) o si trae el encabezado
+`X-Perfilar: 1` y la hace un administrador. Un único hilo muestreador toma
+cada PERFILAR_INTERVALO_MS la pila de los hilos que atienden peticiones
+perfiladas y cuenta cuántas veces aparece cada una.
+
+El resultado se guarda en formato de pilas colapsadas (`mod:func;mod:func N`),
+el que usan flamegraph.pl y speedscope, por petición y acumulado desde el
+último reinicio. Se consulta en /admin/api/perfiles y /admin/perfiles/<id>.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from flask import request
+from flask_login import current_user
+from werkzeug.wsgi import ClosingIterator
+
+CLAVE_ENTORNO = 'itinerar.perfil'
+
+
+class Perfil:
+    """Muestras de pilas de una petición"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, metodo, ruta):
+        self.id = next(self._ids)
+        self.metodo = metodo
+        self.ruta = ruta
+        self.endpoint = None
+        self.fecha = datetime.now().isoformat(timespec='seconds')
+        self.iniciado = None
+        self.segundos = 0.0
+        self.pilas = Counter()
+
+    def resumen(self):
+        return {
+            'id': self.id, 'metodo': self.metodo, 'ruta': self.ruta, 'endpoint': self.endpoint,
+            'fecha': self.fecha, 'ms': round(self.segundos * 1000, 3), 'muestras': sum(self.pilas.values()),
+        }
+
+
+def pilas_colapsadas(pilas):
+    """Texto en formato de pilas colapsadas, de la pila más frecuente a la menos"""
+    return ''.join(f'{pila} {cantidad}\n' for pila, cantidad in pilas.most_common())
+
+
+def _pila(frame):
+    marcos = []
+    while frame is not None:
+        # Los marcos de plantillas Jinja no tienen __name__: se usa el archivo
+        modulo = frame.f_globals.get('__name__') or os.path.basename(frame.f_code.co_filename)
+        marcos.append(f'{modulo}:{frame.f_code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(marcos))
+
+
+class Muestreador:
+    """Hilo que toma muestras de la pila de los hilos con un perfil activo"""
+
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self._activos = {}
+        self._lock = threading.Lock()
+        self._hay_activos = threading.Event()
+        self._hilo = None
+
+    def iniciar(self, perfil):
+        """Empieza a muestrear el hilo actual para el perfil"""
+        with self._lock:
+            perfil.iniciado = time.perf_counter()
+            self._activos[threading.get_ident()] = perfil
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._muestrear, name='muestreador-perfiles', daemon=True)
+                self._hilo.start()
+            self._hay_activos.set()
+
+    def detener(self):
+        """Deja de muestrear el hilo actual"""
+        with self._lock:
+            perfil = self._activos.pop(threading.get_ident(), None)
+            if not self._activos:
+                self._hay_activos.clear()
+        if perfil is not None:
+            perfil.segundos = time.perf_counter() - perfil.iniciado
+        return perfil
+
+    def _muestrear(self):
+        propio = threading.get_ident()
+        while True:
+            self._hay_activos.wait()
+            time.sleep(self.intervalo)
+            frames = sys._current_frames()
+            with self._lock:
+                for id_hilo, perfil in self._activos.items():
+                    frame = frames.get(id_hilo)
+                    if frame is not None and id_hilo != propio:
+                        perfil.pilas[_pila(frame)] += 1
+            del frames
+
+
+class RegistroPerfiles:
+    """Últimos perfiles por petición y pilas acumuladas desde el último reinicio"""
+
+    def __init__(self, maximo=50):
+        self._perfiles = deque(maxlen=maximo)
+        self._acumulado = Counter()
+        self._desde = datetime.now().isoformat(timespec='seconds')
+        self._lock = threading.Lock()
+
+    def agregar(self, perfil):
+        with self._lock:
+            self._perfiles.append(perfil)
+            self._acumulado.update(perfil.pilas)
+
+    def obtener(self, id_perfil):
+        with self._lock:
+            return next((p for p in self._perfiles if p.id == id_perfil), None)
+
+    def resumen(self):
+        with self._lock:
+            return {'desde': self._desde, 'perfiles': [p.resumen() for p in reversed(self._perfiles)]}
+
+    def acumulado(self):
+        with self._lock:
+            return Counter(self._acumulado)
+
+    def reiniciar(self):
+        with self._lock:
+            self._perfiles.clear()
+            self._acumulado.clear()
+            self._desde = datetime.now().isoformat(timespec='seconds')
+
+
+# Instancias compartidas por toda la aplicación
+muestreador = Muestreador()
+registro_perfiles = RegistroPerfiles()
+
+
+class PerfiladorWSGI:
+    """Middleware que perfila las peticiones pedidas (ver el docstring del módulo)"""
+
+    def __init__(self, wsgi_app, app):
+        self.wsgi_app = wsgi_app
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        perfilar_todo = self.app.config['PERFILAR']
+        if not perfilar_todo and environ.get('HTTP_X_PERFILAR') != '1':
+            return self.wsgi_app(environ, start_response)
+
+        perfil = Perfil(environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'))
+        environ[CLAVE_ENTORNO] = perfil
+        if perfilar_todo:
+            muestreador.iniciar(perfil)
+        # Si no, el muestreo lo inicia _autorizar_perfil cuando el usuario es administrador
+
+        def terminar():
+            if perfil.iniciado is not None and muestreador.detener() is perfil:
+                registro_perfiles.agregar(perfil)
+
+        try:
+            return ClosingIterator(self.wsgi_app(environ, start_response), [terminar])
+        except BaseException:
+            terminar()
+            raise
+
+
+def _autorizar_perfil():
+    perfil = request.environ.get(CLAVE_ENTORNO)
+    if perfil is None:
+        return
+    perfil.endpoint = request.endpoint
+    if perfil.iniciado is None and current_user.is_authenticated and current_user.es_administrador():
+        muestreador.iniciar(perfil)
+
+
+def _informar_perfil(response):
+    perfil = request.environ.get(CLAVE_ENTORNO)
+    if perfil is not None and perfil.iniciado is not None:
+        response.headers['X-Perfil'] = str(perfil.id)
+    return response
+
+
+def perfilar(app):
+    """Envuelve la app con el middleware de perfilado"""
+    muestreador.intervalo = app.config['PERFILAR_INTERVALO_MS'] / 1000
+    app.wsgi_app = PerfiladorWSGI(app.wsgi_app, app)
+    app.before_request(_autorizar_perfil)
+    app.after_request(_informar_perfil)
@@ -0,0 +1,57 @@
+"""
+Rutas de administración: diagnóstico de rendimiento
+"""
+from flask import Blueprint, Response, abort, jsonify
+from app.cache_catalogo import cache_catalogo
+from app.instrumentacion import estadisticas_sql
+from app.perfilado import pilas_colapsadas, registro_perfiles
+from app.utils import admin_required
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+@bp.route('/api/consultas', methods=['GET'])
+@admin_required
+def estadisticas_consultas():
+    """Consultas SQL por endpoint: cantidad y tiempo en la base por petición, y las más lentas"""
+    return jsonify({'endpoints': estadisticas_sql.resumen()})
+
+@bp.route('/api/consultas', methods=['DELETE'])
+@admin_required
+def reiniciar_estadisticas_consultas():
+    """Vuelve a cero las estadísticas de consultas"""
+    estadisticas_sql.reiniciar()
+    return '', 204
+
+@bp.route('/api/perfiles', methods=['GET'])
+@admin_required
+def perfiles():
+    """Últimos perfiles de peticiones (X-Perfilar: 1 o PERFILAR=1)"""
+    return jsonify(registro_perfiles.resumen())
+
+@bp.route('/api/perfiles', methods=['DELETE'])
+@admin_required
+def reiniciar_perfiles():
+    """Descarta los perfiles guardados y reinicia el acumulado"""
+    registro_perfiles.reiniciar()
+    return '', 204
+
+@bp.route('/perfiles/acumulado', methods=['GET'])
+@admin_required
+def perfil_acumulado():
+    """Pilas colapsadas de todas las peticiones perfiladas desde el último reinicio"""
+    return Response(pilas_colapsadas(registro_perfiles.acumulado()), mimetype='text/plain')
+
+@bp.route('/perfiles/<int:id_perfil>', methods=['GET'])
+@admin_required
+def perfil(id_perfil):
+    """Pilas colapsadas de una petición, para flamegraph.pl o speedscope"""
+    perfil = registro_perfiles.obtener(id_perfil)
+    if perfil is None:
+        abort(404)
+    return Response(pilas_colapsadas(perfil.pilas), mimetype='text/plain')
+
+@bp.route('/api/cache-catalogo', methods=['GET'])
+@admin_required
+def estado_cache_catalogo():
+    """Aciertos, fallos y entradas del cache del catálogo público"""
+    return jsonify(cache_catalogo.estadisticas())
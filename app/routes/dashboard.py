@@ -1,10 +1,11 @@
 """
 Rutas para el panel de datos (dashboard) con gráficos
 """
-import pandas as pd
 import os
-from flask import Blueprint, jsonify, request, render_template
+from flask import Blueprint, jsonify, request, render_template, current_app
 from app import create_app
+from app.cache_datos import cache_datos, RespuestasPrecalculadas
+from app.utils import admin_required
 
 bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
@@ -17,65 +18,82 @@ def index():
     """Página principal del dashboard"""
     return render_template('dashboard/index.html')
 
-@bp.route('/api/turismo-receptivo', methods=['GET'])
-def turismo_receptivo():
-    """Devuelve datos de turismo receptivo por mes para un año"""
+MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+def _datos_turismo_receptivo(df, año):
+    """Arma el payload de turismo receptivo por mes para un año"""
+    # Filtrar por año y ordenar por mes
+    df_año = df[df['año'] == int(año)].sort_values('mes')
+    return {
+        'labels': [MESES[int(m)-1] for m in df_año['mes']],
+        'data': df_año['turistas'].tolist(),
+        'año': año
+    }
+
+def _datos_motivos_viaje(df, año):
+    """Arma el payload de motivos de viaje por categoría para un año"""
+    df_año = df[df['año'] == int(año)]
+    return {
+        'labels': df_año['categoria'].tolist(),
+        'data': df_año['cantidad'].tolist(),
+        'año': año
+    }
+
+# Respuestas por año precalculadas (se reconstruyen si cambia el CSV)
+_respuestas = {
+    'turismo_receptivo.csv': RespuestasPrecalculadas(
+        os.path.join(get_data_dir(), 'turismo_receptivo.csv'), _datos_turismo_receptivo,
+        columnas=['año', 'mes', 'turistas']),
+    'motivos_viaje.csv': RespuestasPrecalculadas(
+        os.path.join(get_data_dir(), 'motivos_viaje.csv'), _datos_motivos_viaje,
+        columnas=['año', 'categoria', 'cantidad']),
+}
+
+_precalculadas = False
+
+def precalcular_respuestas():
+    """Precalcula las respuestas por año de los datasets disponibles"""
+    global _precalculadas
+    for respuestas in _respuestas.values():
+        if os.path.exists(respuestas.path):
+            respuestas.precalcular()
+    _precalculadas = True
+
+@bp.before_request
+def _precalcular_al_entrar():
+    """La primera petición al dashboard (la página, antes que sus gráficos) precalcula todos los datasets"""
+    if not _precalculadas and current_app.config.get('DASHBOARD_PRECALCULAR'):
+        precalcular_respuestas()
+
+def _respuesta_por_año(nombre_archivo):
+    """Sirve la respuesta precalculada del año pedido con ETag y Cache-Control"""
     año = request.args.get('año', '2024', type=str)
-    
+    respuestas = _respuestas[nombre_archivo]
+
     try:
-        data_dir = get_data_dir()
-        csv_path = os.path.join(data_dir, 'turismo_receptivo.csv')
-        
-        if not os.path.exists(csv_path):
+        if not os.path.exists(respuestas.path):
             return jsonify({'error': 'Archivo de datos no encontrado'}), 404
-        
-        df = pd.read_csv(csv_path)
-        
-        # Filtrar por año
-        df_año = df[df['año'] == int(año)]
-        
-        # Ordenar por mes
-        df_año = df_año.sort_values('mes')
-        
-        # Formatear datos
-        meses = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
-        datos = {
-            'labels': [meses[int(m)-1] for m in df_año['mes']],
-            'data': df_año['turistas'].tolist(),
-            'año': año
-        }
-        
-        return jsonify(datos)
+
+        cuerpo, etag = respuestas.obtener(año)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    respuesta = current_app.response_class(cuerpo, mimetype='application/json')
+    respuesta.set_etag(etag)
+    respuesta.cache_control.public = True
+    respuesta.cache_control.max_age = current_app.config.get('DASHBOARD_CACHE_MAX_AGE', 300)
+    # Devuelve 304 sin cuerpo si coincide el If-None-Match del cliente
+    return respuesta.make_conditional(request)
+
+@bp.route('/api/turismo-receptivo', methods=['GET'])
+def turismo_receptivo():
+    """Devuelve datos de turismo receptivo por mes para un año"""
+    return _respuesta_por_año('turismo_receptivo.csv')
+
 @bp.route('/api/motivos-viaje', methods=['GET'])
 def motivos_viaje():
     """Devuelve datos de motivos de viaje por categoría para un año"""
-    año = request.args.get('año', '2024', type=str)
-    
-    try:
-        data_dir = get_data_dir()
-        csv_path = os.path.join(data_dir, 'motivos_viaje.csv')
-        
-        if not os.path.exists(csv_path):
-            return jsonify({'error': 'Archivo de datos no encontrado'}), 404
-        
-        df = pd.read_csv(csv_path)
-        
-        # Filtrar por año
-        df_año = df[df['año'] == int(año)]
-        
-        # Formatear datos
-        datos = {
-            'labels': df_año['categoria'].tolist(),
-            'data': df_año['cantidad'].tolist(),
-            'año': año
-        }
-        
-        return jsonify(datos)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return _respuesta_por_año('motivos_viaje.csv')
 
 @bp.route('/api/rangos-edad', methods=['GET'])
 def rangos_edad():
@@ -87,7 +105,7 @@ def rangos_edad():
         if not os.path.exists(csv_path):
             return jsonify({'error': 'Archivo de datos no encontrado'}), 404
         
-        df = pd.read_csv(csv_path)
+        df = cache_datos.obtener(csv_path, ['rango_edad', 'cantidad'])
         
         # Formatear datos
         datos = {
@@ -109,12 +127,15 @@ def años_disponibles():
         if not os.path.exists(csv_path):
             return jsonify({'años': ['2024']})
         
-        df = pd.read_csv(csv_path)
+        df = cache_datos.obtener(csv_path, ['año'])
         años = sorted(df['año'].unique().tolist(), reverse=True)
         
         return jsonify({'años': años})
     except Exception as e:
         return jsonify({'años': ['2024']})
 
-
-
+@bp.route('/api/cache', methods=['GET'])
+@admin_required
+def estado_cache():
+    """Devuelve los contadores del cache de datasets (solo administradores)"""
+    return jsonify(cache_datos.estadisticas())
@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app import db
 from app.models import Itinerario, Etapa, Ciudad, Provincia, LugarInteres
+from app.orden_etapas import ESPACIO, orden_al_final, orden_entre, mover as mover_etapa
 from app.utils import planificador_required
 from datetime import datetime
 
@@ -108,12 +109,8 @@ def crear(itinerario_id):
             notaPersonal=nota_personal if nota_personal else None
         )
 
-        # Asignar nuevo orden al final de la lista
-        max_orden = db.session.query(db.func.max(Etapa.orden)).filter_by(idItinerario=itinerario_id).scalar()
-        if max_orden is None:
-            nueva_etapa.orden = 1
-        else:
-            nueva_etapa.orden = max_orden + 1
+        # Asignar nuevo orden al final de la lista (con espacio para mover etapas entre medio)
+        nueva_etapa.orden = orden_al_final(itinerario_id)
 
         try:
             db.session.add(nueva_etapa)
@@ -301,4 +298,207 @@ def bajar(itinerario_id, etapa_id):
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error del servidor: {str(e)}'}), 500
-    
\ No newline at end of file
+
+@bp.route('/<int:etapa_id>/mover', methods=['POST'])
+@login_required
+@planificador_required
+def mover(itinerario_id, etapa_id):
+    """Mueve una etapa a una posición (desde 1) con una sola actualización"""
+    itinerario, puede_modificar = verificar_permiso_itinerario(itinerario_id)
+
+    if not puede_modificar:
+        return jsonify({'success': False, 'message': 'No tienes permiso'}), 403
+
+    etapa = Etapa.query.filter_by(idEtapa=etapa_id, idItinerario=itinerario_id).first_or_404()
+
+    datos = request.get_json(silent=True) or request.form
+    try:
+        posicion = int(datos.get('posicion'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'La posición debe ser un número entero'}), 400
+
+    try:
+        posicion = mover_etapa(etapa, posicion)
+        db.session.commit()
+        return jsonify({'success': True, 'posicion': posicion})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error del servidor: {str(e)}'}), 500
+
+# Campos de una etapa que se pueden enviar en las operaciones del lote
+CAMPOS_ETAPA = ('actividadDelDia', 'idCiudad', 'idLugarInteres', 'fechaInicio', 'fechaFin', 'notaPersonal')
+CAMPOS_TEXTO = ('actividadDelDia', 'fechaInicio', 'fechaFin', 'notaPersonal')
+# Ciudad o lugar al que apunta cada campo de id, para verificar que exista
+CAMPOS_ID = {'idCiudad': Ciudad, 'idLugarInteres': LugarInteres}
+
+def _es_id(valor):
+    """True si el valor es un id válido: un entero positivo (no bool) o un texto de dígitos"""
+    if type(valor) is str:
+        valor = int(valor) if valor.isascii() and valor.isdigit() else None
+    return type(valor) is int and 0 < valor < 2 ** 63
+
+def _valores_etapa(itinerario, datos, etapa=None):
+    """Valida los campos de una etapa nueva (etapa=None) o los que cambian de una existente.
+    Devuelve (valores, errores); los campos no enviados conservan el valor de la etapa."""
+    errores = []
+    if not isinstance(datos, dict):
+        return {}, ['Los datos de la etapa deben ser un objeto.']
+
+    valores = {}
+    for campo in CAMPOS_ETAPA:
+        if campo in datos:
+            valor = datos[campo]
+            valores[campo] = valor.strip() if isinstance(valor, str) else valor
+        elif etapa is not None:
+            valores[campo] = getattr(etapa, campo)
+        else:
+            valores[campo] = None
+
+    # Los campos de texto enviados deben ser texto o null (un objeto o un número fallaría al guardar)
+    tipos_validos = True
+    for campo in CAMPOS_TEXTO:
+        if campo in datos and valores[campo] is not None and not isinstance(valores[campo], str):
+            errores.append(f'{campo} debe ser texto.')
+            tipos_validos = False
+        elif valores[campo] == '':
+            valores[campo] = None
+
+    actividad = valores['actividadDelDia']
+    if not actividad:
+        errores.append('La actividad del día es obligatoria.')
+    elif isinstance(actividad, str) and etapa is None and len(actividad) < 5:
+        errores.append('La actividad del día debe tener al menos 5 caracteres.')
+
+    for campo in CAMPOS_ID:
+        if valores[campo] in (None, ''):
+            valores[campo] = None
+        elif _es_id(valores[campo]):
+            valores[campo] = int(valores[campo])
+        else:
+            errores.append(f'{campo} debe ser un número entero positivo.')
+
+    if etapa is None and not valores['fechaInicio']:
+        errores.append('La fecha de inicio es obligatoria.')
+    if tipos_validos:
+        errores.extend(validate_etapa_dates(itinerario, valores['fechaInicio'], valores['fechaFin']))
+    return valores, errores
+
+def _validar_orden(etapas, orden):
+    """Verifica que el orden nuevo incluya exactamente una vez cada etapa del itinerario"""
+    if not isinstance(orden, list) or not all(type(id_etapa) is int for id_etapa in orden):
+        return ['El orden debe ser una lista de ids de etapas.']
+    if len(set(orden)) != len(orden):
+        return ['El orden tiene etapas repetidas.']
+    if set(orden) != set(etapas):
+        return ['El orden debe incluir todas las etapas del itinerario y solo esas.']
+    return []
+
+def _validar_operaciones(itinerario, etapas, operaciones):
+    """Valida todas las operaciones sin tocar la base.
+    Devuelve (cambios, errores): cambios es una lista de (operación, etapa, valores)."""
+    if not isinstance(operaciones, list) or not operaciones:
+        return [], [{'operacion': None, 'errores': ['Las operaciones deben ser una lista no vacía.']}]
+
+    cambios = []
+    errores = []
+    usadas = set()
+    for indice, operacion in enumerate(operaciones):
+        errores_op = []
+        etapa = valores = None
+        tipo = operacion.get('op') if isinstance(operacion, dict) else None
+        if tipo not in ('crear', 'editar', 'eliminar'):
+            errores_op.append("La operación debe ser 'crear', 'editar' o 'eliminar'.")
+        elif tipo == 'crear':
+            valores, errores_op = _valores_etapa(itinerario, operacion.get('datos'))
+        else:
+            etapa = etapas.get(operacion.get('idEtapa'))
+            if etapa is None:
+                errores_op.append('La etapa no existe en este itinerario.')
+            elif etapa.idEtapa in usadas:
+                errores_op.append('La etapa ya aparece en otra operación del lote.')
+            else:
+                usadas.add(etapa.idEtapa)
+                if tipo == 'editar':
+                    valores, errores_op = _valores_etapa(itinerario, operacion.get('datos'), etapa)
+        if errores_op:
+            errores.append({'operacion': indice, 'errores': errores_op})
+        else:
+            cambios.append((indice, tipo, etapa, valores))
+
+    # Las ciudades y lugares que asignan las operaciones deben existir (una consulta por tabla)
+    inexistentes = {}
+    for campo, modelo in CAMPOS_ID.items():
+        asignados = {valores[campo] for _, tipo, etapa, valores in cambios
+                     if valores and valores[campo] is not None
+                     and (etapa is None or valores[campo] != getattr(etapa, campo))}
+        if not asignados:
+            continue
+        clave = modelo.__table__.primary_key.columns.values()[0]
+        existentes = {id for (id,) in db.session.query(clave).filter(clave.in_(asignados))}
+        for indice, tipo, etapa, valores in cambios:
+            if valores and valores[campo] in asignados - existentes:
+                inexistentes.setdefault(indice, []).append(f'{campo} no existe.')
+    if inexistentes:
+        errores.extend({'operacion': indice, 'errores': errores_op} for indice, errores_op in inexistentes.items())
+        errores.sort(key=lambda error: error['operacion'])
+    return [(tipo, etapa, valores) for _, tipo, etapa, valores in cambios], errores
+
+@bp.route('/lote', methods=['POST'])
+@login_required
+@planificador_required
+def lote(itinerario_id):
+    """Aplica en una sola transacción un orden nuevo completo ({"orden": [ids]})
+    o una lista de operaciones ({"operaciones": [{"op": "crear"|"editar"|"eliminar", ...}]})"""
+    itinerario, puede_modificar = verificar_permiso_itinerario(itinerario_id)
+
+    if not puede_modificar:
+        return jsonify({'success': False, 'message': 'No tienes permiso'}), 403
+
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict) or ('orden' in datos) == ('operaciones' in datos):
+        return jsonify({'success': False,
+                        'message': "Envíe un objeto JSON con 'orden' o con 'operaciones'"}), 400
+
+    # Todas las etapas del itinerario en una consulta; la validación se hace en memoria
+    etapas = {etapa.idEtapa: etapa for etapa in itinerario.etapas}
+
+    if 'orden' in datos:
+        errores = _validar_orden(etapas, datos['orden'])
+        if errores:
+            return jsonify({'success': False, 'message': errores[0]}), 400
+        # Solo se actualizan las etapas cuyo orden cambia
+        for posicion, id_etapa in enumerate(datos['orden'], start=1):
+            etapas[id_etapa].orden = posicion * ESPACIO
+        creadas = []
+    else:
+        cambios, errores = _validar_operaciones(itinerario, etapas, datos['operaciones'])
+        if errores:
+            return jsonify({'success': False, 'message': 'Hay operaciones inválidas; no se aplicó ninguna',
+                            'errores': errores}), 400
+
+        ultimo = max((etapa.orden for etapa in etapas.values() if etapa.orden is not None), default=None)
+        creadas = []
+        for tipo, etapa, valores in cambios:
+            if tipo == 'crear':
+                ultimo = orden_entre(ultimo, None)
+                etapa = Etapa(idItinerario=itinerario_id, orden=ultimo, **valores)
+                db.session.add(etapa)
+                creadas.append(etapa)
+            elif tipo == 'editar':
+                for campo, valor in valores.items():
+                    setattr(etapa, campo, valor)
+            else:
+                db.session.delete(etapa)
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error del servidor: {str(e)}'}), 500
+
+    etapas = Etapa.query.filter_by(idItinerario=itinerario_id).order_by(Etapa.orden, Etapa.idEtapa).all()
+    return jsonify({
+        'success': True,
+        'creadas': [etapa.idEtapa for etapa in creadas],
+        'etapas': [{'idEtapa': etapa.idEtapa, 'orden': etapa.orden} for etapa in etapas],
+    })
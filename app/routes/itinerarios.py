@@ -1,52 +1,148 @@
 """
 Rutas para la gestión de itinerarios
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
+from markupsafe import Markup
+from sqlalchemy.orm import joinedload, selectinload
 from app import db
-from app.models import Itinerario, Usuario, Rol
+from app.cache_catalogo import cache_catalogo, etiqueta_itinerario
+from app.models import Itinerario, Etapa, Ciudad, Usuario, Rol
+from app.models.itinerario import FECHA_ORDEN
+from app.paginacion import paginar, tamanio_pagina, CursorInvalido
 from app.utils import planificador_required
 
 bp = Blueprint('itinerarios', __name__, url_prefix='/itinerarios')
 
+# Valores de ?orden= de los listados -> orden descendente por fecha
+ORDENES = {'recientes': True, 'antiguos': False}
+
+def resumen_etapas(ids_itinerarios):
+    """Cantidad de etapas y fechas que abarcan, por itinerario, en una sola consulta agrupada"""
+    if not ids_itinerarios:
+        return {}
+    filas = (db.session.query(Etapa.idItinerario,
+                              db.func.count(Etapa.idEtapa),
+                              db.func.min(Etapa.fechaInicio),
+                              db.func.max(db.func.coalesce(Etapa.fechaFin, Etapa.fechaInicio)))
+             .filter(Etapa.idItinerario.in_(ids_itinerarios))
+             .group_by(Etapa.idItinerario))
+    return {id_itinerario: {'etapas': cantidad, 'desde': desde, 'hasta': hasta}
+            for id_itinerario, cantidad, desde, hasta in filas}
+
+def _paginar_por_fecha(query, cursor):
+    """Una página de la consulta ordenada por fecha (?orden=, ?limite=) desde el cursor indicado"""
+    return paginar(query, [FECHA_ORDEN, Itinerario.idItinerario],
+                   cursor=cursor,
+                   limite=tamanio_pagina(request.args.get('limite')),
+                   clave=lambda itinerario: (itinerario.fechaInicio or '', itinerario.idItinerario),
+                   descendente=ORDENES.get(request.args.get('orden'), True))
+
+def _pagina_itinerarios(query):
+    """Una página de la consulta ordenada por fecha (?orden=, ?cursor=, ?limite=) y el resumen de sus etapas"""
+    itinerarios, siguiente = _paginar_por_fecha(query.options(joinedload(Itinerario.usuario)),
+                                                request.args.get('cursor'))
+    return itinerarios, siguiente, resumen_etapas([i.idItinerario for i in itinerarios])
+
+def _clave_pagina():
+    """Parte de la clave de cache que identifica la página pedida"""
+    orden = request.args.get('orden') if request.args.get('orden') in ORDENES else 'recientes'
+    return f"{orden}|{tamanio_pagina(request.args.get('limite'))}|{request.args.get('cursor', '')}"
+
 @bp.route('/')
 def listar():
-    """Lista todos los itinerarios públicos y los del usuario actual"""
+    """Lista una página de los itinerarios públicos y los del usuario actual"""
+    mis_itinerarios, mis_siguiente = [], None
     # Si el usuario está autenticado, mostrar sus itinerarios y los públicos
     if current_user.is_authenticated:
-        # Itinerarios del usuario actual
-        mis_itinerarios = Itinerario.query.filter_by(idUsuario=current_user.idUsuario).all()
+        # Primera página de los itinerarios del usuario actual (solo en la primera página del listado;
+        # el resto se recorre en mis_itinerarios)
+        if not request.args.get('cursor'):
+            mis_itinerarios, mis_siguiente = _paginar_por_fecha(
+                Itinerario.query.filter_by(idUsuario=current_user.idUsuario), None)
         
         # Si es administrador, puede ver todos los itinerarios (públicos y privados)
         if current_user.es_administrador():
             # Todos los itinerarios de otros usuarios (públicos y privados)
-            itinerarios_publicos = Itinerario.query.filter(
+            query = Itinerario.query.filter(
                 Itinerario.idUsuario != current_user.idUsuario
-            ).all()
+            )
         else:
             # Solo itinerarios públicos de otros usuarios
-            itinerarios_publicos = Itinerario.query.filter(
+            query = Itinerario.query.filter(
                 Itinerario.esPrivado == 0,
                 Itinerario.idUsuario != current_user.idUsuario
-            ).all()
-        
-        return render_template('itinerarios/listar.html', 
-                             mis_itinerarios=mis_itinerarios,
-                             itinerarios_publicos=itinerarios_publicos)
+            )
     else:
         # Solo mostrar itinerarios públicos
-        itinerarios_publicos = Itinerario.query.filter_by(esPrivado=0).all()
-        return render_template('itinerarios/listar.html',
-                             mis_itinerarios=[],
-                             itinerarios_publicos=itinerarios_publicos)
+        query = Itinerario.query.filter_by(esPrivado=0)
+    
+    orden = request.args.get('orden', 'recientes')
+    
+    def renderizar_publicos():
+        itinerarios_publicos, siguiente, resumenes = _pagina_itinerarios(query)
+        html = render_template('itinerarios/_publicos.html',
+                               itinerarios_publicos=itinerarios_publicos,
+                               resumenes=resumenes,
+                               siguiente=siguiente,
+                               orden=orden)
+        return html, [etiqueta_itinerario(i.idItinerario) for i in itinerarios_publicos]
+    
+    try:
+        if current_user.is_authenticated:
+            publicos_html = renderizar_publicos()[0]
+        else:
+            # Los visitantes anónimos ven todos el mismo fragmento: se comparte en el cache
+            publicos_html = cache_catalogo.obtener_o_calcular(
+                f"listar:{_clave_pagina()}", renderizar_publicos)
+    except CursorInvalido:
+        abort(400)
+    
+    return render_template('itinerarios/listar.html',
+                         mis_itinerarios=mis_itinerarios,
+                         mis_siguiente=mis_siguiente,
+                         publicos_html=Markup(publicos_html),
+                         orden=orden)
+
+@bp.route('/api/publicos', methods=['GET'])
+def api_publicos():
+    """Página de itinerarios públicos con la cantidad de etapas y las fechas que abarcan"""
+    def consultar():
+        itinerarios, siguiente, resumenes = _pagina_itinerarios(Itinerario.query.filter_by(esPrivado=0))
+        resultados = []
+        for itinerario in itinerarios:
+            resumen = resumenes.get(itinerario.idItinerario, {'etapas': 0, 'desde': None, 'hasta': None})
+            resultados.append({
+                'id': itinerario.idItinerario,
+                'titulo': itinerario.titulo,
+                'descripcion': itinerario.descripcion,
+                'fechaInicio': itinerario.fechaInicio,
+                'fechaFin': itinerario.fechaFin,
+                'autor': f'{itinerario.usuario.nombre} {itinerario.usuario.apellido or ""}'.strip(),
+                'etapas': resumen['etapas'],
+                'etapasDesde': resumen['desde'],
+                'etapasHasta': resumen['hasta'],
+            })
+        return ({'itinerarios': resultados, 'next': siguiente},
+                [etiqueta_itinerario(i.idItinerario) for i in itinerarios])
+    
+    try:
+        return jsonify(cache_catalogo.obtener_o_calcular(f"api_publicos:{_clave_pagina()}", consultar))
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
 
 @bp.route('/mis-itinerarios')
 @login_required
 @planificador_required
 def mis_itinerarios():
-    """Lista solo los itinerarios del usuario actual"""
-    itinerarios = Itinerario.query.filter_by(idUsuario=current_user.idUsuario).order_by(Itinerario.fechaInicio.desc()).all()
-    return render_template('itinerarios/mis_itinerarios.html', itinerarios=itinerarios)
+    """Lista una página de los itinerarios del usuario actual"""
+    try:
+        itinerarios, siguiente, resumenes = _pagina_itinerarios(
+            Itinerario.query.filter_by(idUsuario=current_user.idUsuario))
+    except CursorInvalido:
+        abort(400)
+    return render_template('itinerarios/mis_itinerarios.html', itinerarios=itinerarios, resumenes=resumenes,
+                           siguiente=siguiente, orden=request.args.get('orden', 'recientes'))
 
 @bp.route('/crear', methods=['GET', 'POST'])
 @login_required
@@ -174,7 +270,15 @@ def eliminar(id):
 @bp.route('/<int:id>')
 def detalle(id):
     """Muestra el detalle de un itinerario"""
-    itinerario = Itinerario.query.get_or_404(id)
+    # Todo el grafo del itinerario en dos consultas: itinerario con su creador, y
+    # etapas (en su orden) con ciudad, provincia y lugar de interés
+    itinerario = Itinerario.query.options(
+        joinedload(Itinerario.usuario),
+        selectinload(Itinerario.etapas).options(
+            joinedload(Etapa.ciudad).joinedload(Ciudad.provincia),
+            joinedload(Etapa.lugar_interes),
+        ),
+    ).filter_by(idItinerario=id).first_or_404()
     
     # Verificar permisos: si es privado, solo el dueño o admin puede verlo
     if itinerario.esPrivado == 1:
@@ -182,15 +286,7 @@ def detalle(id):
             flash('Este itinerario es privado', 'error')
             return redirect(url_for('itinerarios.listar'))
     
-    # Obtener el usuario creador
-    usuario_creador = Usuario.query.get(itinerario.idUsuario)
-    
-    # Ordenar etapas por fecha (las que no tienen fecha al final)
-    etapas_ordenadas = sorted(itinerario.etapas, 
-                               key=lambda e: (e.fechaInicio is None, e.fechaInicio or ''))
-    
     return render_template('itinerarios/detalle.html', 
                          itinerario=itinerario,
-                         usuario_creador=usuario_creador,
-                         etapas_ordenadas=etapas_ordenadas)
-
+                         usuario_creador=itinerario.usuario,
+                         etapas_ordenadas=itinerario.etapas)
@@ -1,12 +1,39 @@
 """
 Rutas para buscar lugares de interés
 """
-from flask import Blueprint, jsonify, request, render_template
+from flask import Blueprint, jsonify, request, render_template, abort
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import LugarInteres, Provincia
+from app.models import LugarInteres, Provincia, Ciudad
+from app.busqueda import filtrar_por_nombre
+from app.autocompletar import obtener_indice
+from app.paginacion import paginar, tamanio_pagina, CursorInvalido
 
 bp = Blueprint('lugares', __name__, url_prefix='/lugares')
 
+def _filtros():
+    """Filtros de la petición (?nombre=, ?provincia_id=, ?categoria=), sin espacios sobrantes"""
+    return {campo: request.args.get(campo, '').strip() for campo in ('nombre', 'provincia_id', 'categoria')}
+
+def _filtrar(query, nombre, provincia_id, categoria):
+    """Aplica los filtros a una consulta de lugares. Devuelve (consulta, relevancia) como filtrar_por_nombre"""
+    # Filtrar por nombre (prefijos en el índice FTS5)
+    relevancia = None
+    if nombre:
+        query, relevancia = filtrar_por_nombre(query, nombre)
+    
+    # Filtrar por provincia
+    if provincia_id:
+        try:
+            query = query.filter(LugarInteres.idProvincia == int(provincia_id))
+        except ValueError:
+            pass
+    
+    # Filtrar por categoría
+    if categoria:
+        query = query.filter(LugarInteres.categoria == categoria)
+    return query, relevancia
+
 @bp.route('/')
 def index():
     """Página principal de lugares de interés"""
@@ -17,78 +44,123 @@ def index():
     categorias = db.session.query(LugarInteres.categoria).distinct().all()
     categorias_list = [cat[0] for cat in categorias if cat[0]]
     
-    # Obtener lugares (con paginación opcional)
-    lugares = LugarInteres.query.order_by(LugarInteres.nombre).limit(50).all()
+    # Obtener una página de los lugares filtrados en el servidor (paginación por cursor; por
+    # relevancia si se busca por texto con FTS5, si no por nombre e id)
+    filtros = _filtros()
+    query = LugarInteres.query.options(joinedload(LugarInteres.provincia), joinedload(LugarInteres.ciudad))
+    query, relevancia = _filtrar(query, **filtros)
+    if relevancia is not None:
+        query = query.add_columns(relevancia)
+        columnas_orden = [relevancia, LugarInteres.idLugarInteres]
+        clave = lambda fila: (fila[1], fila[0].idLugarInteres)
+    else:
+        columnas_orden = [LugarInteres.nombre, LugarInteres.idLugarInteres]
+        clave = lambda lugar: (lugar.nombre, lugar.idLugarInteres)
+    try:
+        lugares, siguiente = paginar(query, columnas_orden,
+                                     cursor=request.args.get('cursor'),
+                                     limite=tamanio_pagina(request.args.get('limite')),
+                                     clave=clave)
+    except CursorInvalido:
+        abort(400)
+    if relevancia is not None:
+        lugares = [lugar for lugar, _ in lugares]
     
     return render_template('lugares/index.html',
                          lugares=lugares,
+                         siguiente=siguiente,
+                         filtros={campo: valor for campo, valor in filtros.items() if valor},
                          provincias=provincias,
                          categorias=categorias_list)
 
 @bp.route('/api/buscar', methods=['GET'])
 def buscar():
     """Busca lugares de interés por nombre y/o provincia"""
-    nombre = request.args.get('nombre', '').strip()
-    provincia_id = request.args.get('provincia_id', '').strip()
-    categoria = request.args.get('categoria', '').strip()
-    
-    query = LugarInteres.query
+    # Una sola consulta con las columnas necesarias (sin cargar objetos ni relaciones)
+    query = (db.session.query(LugarInteres.idLugarInteres, LugarInteres.nombre,
+                              LugarInteres.categoria, Provincia.nombre, Ciudad.nombre,
+                              LugarInteres.enlaceFicha)
+             .outerjoin(Provincia, Provincia.idProvincia == LugarInteres.idProvincia)
+             .outerjoin(Ciudad, Ciudad.idCiudad == LugarInteres.idCiudad))
+    query, relevancia = _filtrar(query, **_filtros())
     
-    # Filtrar por nombre (búsqueda parcial, case-insensitive)
-    if nombre:
-        query = query.filter(LugarInteres.nombre.ilike(f'%{nombre}%'))
-    
-    # Filtrar por provincia
-    if provincia_id:
-        try:
-            query = query.filter(LugarInteres.idProvincia == int(provincia_id))
-        except ValueError:
-            pass
+    # Paginar por cursor y formatear directamente desde las filas. Con búsqueda por texto
+    # en FTS5 el orden es por relevancia (rank, id); si no, por nombre e id
+    if relevancia is not None:
+        query = query.add_columns(relevancia)
+        columnas_orden = [relevancia, LugarInteres.idLugarInteres]
+        clave = lambda fila: (fila[6], fila[0])
+    else:
+        columnas_orden = [LugarInteres.nombre, LugarInteres.idLugarInteres]
+        clave = lambda fila: (fila[1], fila[0])
+    try:
+        filas, siguiente = paginar(query, columnas_orden,
+                                   cursor=request.args.get('cursor'),
+                                   limite=tamanio_pagina(request.args.get('limite')),
+                                   clave=clave)
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Filtrar por categoría
-    if categoria:
-        query = query.filter(LugarInteres.categoria == categoria)
-    
-    # Limitar resultados a 50
-    lugares = query.limit(50).all()
+    resultados = [
+        {
+            'id': id_lugar,
+            'nombre': nombre_lugar,
+            'categoria': categoria_lugar,
+            'provincia': provincia,
+            'ciudad': ciudad,
+            'enlace': enlace
+        }
+        for id_lugar, nombre_lugar, categoria_lugar, provincia, ciudad, enlace, *_ in filas
+    ]
     
-    # Formatear resultados
-    resultados = []
-    for lugar in lugares:
-        resultados.append({
-            'id': lugar.idLugarInteres,
-            'nombre': lugar.nombre,
-            'categoria': lugar.categoria,
-            'provincia': lugar.provincia.nombre if lugar.provincia else None,
-            'ciudad': lugar.ciudad.nombre if lugar.ciudad else None,
-            'enlace': lugar.enlaceFicha
-        })
-    
-    return jsonify({'lugares': resultados})
+    return jsonify({'lugares': resultados, 'next': siguiente})
 
 @bp.route('/api/por-provincia/<int:provincia_id>', methods=['GET'])
 def por_provincia(provincia_id):
     """Obtiene todos los lugares de interés de una provincia"""
     categoria = request.args.get('categoria', '').strip()
     
-    query = LugarInteres.query.filter_by(idProvincia=provincia_id)
+    query = (db.session.query(LugarInteres.idLugarInteres, LugarInteres.nombre,
+                              LugarInteres.categoria, Ciudad.nombre, LugarInteres.enlaceFicha)
+             .outerjoin(Ciudad, Ciudad.idCiudad == LugarInteres.idCiudad)
+             .filter(LugarInteres.idProvincia == provincia_id))
     
     if categoria:
-        query = query.filter_by(categoria=categoria)
+        query = query.filter(LugarInteres.categoria == categoria)
     
-    lugares = query.all()
+    try:
+        filas, siguiente = paginar(query, [LugarInteres.nombre, LugarInteres.idLugarInteres],
+                                   cursor=request.args.get('cursor'),
+                                   limite=tamanio_pagina(request.args.get('limite')),
+                                   clave=lambda fila: (fila[1], fila[0]))
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
     
-    resultados = []
-    for lugar in lugares:
-        resultados.append({
-            'id': lugar.idLugarInteres,
-            'nombre': lugar.nombre,
-            'categoria': lugar.categoria,
-            'ciudad': lugar.ciudad.nombre if lugar.ciudad else None,
-            'enlace': lugar.enlaceFicha
-        })
+    resultados = [
+        {
+            'id': id_lugar,
+            'nombre': nombre_lugar,
+            'categoria': categoria_lugar,
+            'ciudad': ciudad,
+            'enlace': enlace
+        }
+        for id_lugar, nombre_lugar, categoria_lugar, ciudad, enlace in filas
+    ]
     
-    return jsonify({'lugares': resultados})
+    return jsonify({'lugares': resultados, 'next': siguiente})
+
+@bp.route('/api/autocompletar', methods=['GET'])
+def autocompletar():
+    """Sugiere lugares, ciudades y provincias cuyo nombre empieza con el texto"""
+    texto = request.args.get('q', '').strip()
+    provincia_id = request.args.get('provincia_id', type=int)
+    categoria = request.args.get('categoria', '').strip() or None
+    tipos = [t for t in request.args.get('tipos', '').split(',') if t] or None
+    limite = min(request.args.get('limite', 10, type=int), 50)
+
+    resultados = obtener_indice().buscar(texto, limite=limite, provincia_id=provincia_id,
+                                         categoria=categoria, tipos=tipos)
+    return jsonify({'resultados': resultados})
 
 @bp.route('/api/categorias', methods=['GET'])
 def categorias():
@@ -1,6 +1,7 @@
 """
 Utilidades y decoradores para la aplicación
 """
+import unicodedata
 from functools import wraps
 from flask import abort, redirect, url_for
 from flask_login import current_user
@@ -41,3 +42,12 @@ def format_date(value, format='%d/%m/%Y'):
         # Si falla la conversión, devolver el valor original
         return value
 
+def normalizar_texto(value):
+    """Normaliza un texto para búsquedas: sin acentos, en minúsculas y con espacios simples."""
+    if value is None:
+        return None
+    sin_acentos = ''.join(
+        c for c in unicodedata.normalize('NFKD', str(value))
+        if not unicodedata.combining(c)
+    )
+    return ' '.join(sin_acentos.casefold().split())
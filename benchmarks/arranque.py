@@ -0,0 +1,79 @@
+"""
+Benchmark de arranque: tiempo de import y memoria (RSS) tras create_app()
+
+Ejecuta create_app() en un proceso nuevo con la configuración por
+defecto y verifica que no se carguen módulos pesados (pandas, numpy) ni
+se superen los límites indicados.
+Sale con código 1 si detecta una regresión.
+
+Uso:
+    python -m benchmarks.arranque [--max-segundos 1.5] [--max-rss-mb 80]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODULOS_PESADOS = ['pandas', 'numpy']
+
+# Código que se ejecuta en el proceso hijo
+_SCRIPT = """
+import json, resource, sys, time
+inicio = time.perf_counter()
+from app import create_app
+create_app()
+segundos = time.perf_counter() - inicio
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'segundos': segundos,
+    'rss_mb': rss_kb / 1024,
+    'modulos_pesados': [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def medir_arranque():
+    """Mide el arranque de la app en un proceso nuevo y devuelve un dict con los resultados"""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    salida = subprocess.run(
+        [sys.executable, '-c', _SCRIPT % MODULOS_PESADOS],
+        cwd=raiz, capture_output=True, text=True, check=True,
+        env={k: v for k, v in os.environ.items() if k != 'DASHBOARD_PRECALCULAR'}
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de arranque de la aplicación')
+    parser.add_argument('--max-segundos', type=float, default=1.5)
+    parser.add_argument('--max-rss-mb', type=float, default=80)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    resultados = [medir_arranque() for _ in range(args.repeticiones)]
+    segundos = min(r['segundos'] for r in resultados)
+    rss_mb = min(r['rss_mb'] for r in resultados)
+    pesados = resultados[0]['modulos_pesados']
+
+    print(f"Tiempo de import + create_app(): {segundos * 1000:.0f} ms")
+    print(f"RSS máximo tras create_app():    {rss_mb:.1f} MB")
+    print(f"Módulos pesados cargados:        {', '.join(pesados) or 'ninguno'}")
+
+    errores = []
+    if pesados:
+        errores.append(f"create_app() cargó {', '.join(pesados)}")
+    if segundos > args.max_segundos:
+        errores.append(f"el arranque tardó {segundos:.2f}s (máximo {args.max_segundos}s)")
+    if rss_mb > args.max_rss_mb:
+        errores.append(f"RSS de {rss_mb:.1f} MB (máximo {args.max_rss_mb} MB)")
+
+    if errores:
+        for error in errores:
+            print(f"❌ {error}")
+        sys.exit(1)
+    print("✅ Arranque dentro de los límites")
+
+
+if __name__ == '__main__':
+    main()
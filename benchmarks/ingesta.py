@@ -0,0 +1,116 @@
+"""
+Benchmark de ingesta: memoria máxima (RSS) y tiempo de carga según el tamaño del CSV
+
+Genera CSV sintéticos de alojamientos de distintos tamaños y los carga en
+una base SQLite temporal, cada uno en un proceso nuevo, leyendo el archivo
+completo y por lotes (--por-lotes de cargar_lugares.py). En el modo por
+lotes el RSS máximo no debería crecer con el tamaño del archivo; sale con
+código 1 si crece más que --max-crecimiento-mb entre el menor y el mayor.
+
+Uso:
+    python -m benchmarks.ingesta [--filas 20000 80000 320000] [--tamanio-lote 5000]
+                                 [--max-crecimiento-mb 40] [--salida resultados.json]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+# Código que se ejecuta en el proceso hijo: carga el CSV y reporta tiempo y RSS máximo
+_SCRIPT = """
+import contextlib, io, json, resource, sys, time
+import cargar_lugares as cl
+from app import create_app, db
+ruta, tamanio_lote = sys.argv[1], int(sys.argv[2])
+fuente = cl.FuenteDatos('alojamientos.csv', 'Alojamiento', 'Alojamientos')
+app = create_app()
+with app.app_context():
+    db.create_all()
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if tamanio_lote:
+            lotes = cl.leer_por_lotes(fuente, ruta, tamanio_lote)
+        else:
+            _, leidas, lugares, _ = cl.leer_fuente(fuente, ruta)
+            lotes = [(leidas, lugares)]
+        resumen, leidas, _ = cl.escribir_fuente(fuente, lotes)
+    segundos = time.perf_counter() - inicio
+print(json.dumps({
+    'filas': leidas,
+    'cargados': resumen['insertados'],
+    'segundos': segundos,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def generar_csv(ruta, filas, semilla=1):
+    """Escribe un CSV de alojamientos sintéticos con provincias y ciudades reales"""
+    from data.provincias import provincias_data
+
+    rng = random.Random(semilla)
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['nombre', 'provincia', 'ciudad', 'fuente', 'id', 'enlace'])
+        for i in range(filas):
+            provincia = rng.choice(provincias_data)
+            ciudad = rng.choice(provincia['ciudades'])
+            escritor.writerow([f'Alojamiento {i} {ciudad}', provincia['nombre'], ciudad,
+                               'datos.gob.ar', i, f'https://datos.gob.ar/alojamientos/{i}'])
+
+
+def medir_carga(ruta_csv, tamanio_lote, directorio):
+    """Carga el CSV en una base nueva en un proceso aparte y devuelve un dict con los resultados"""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    base = os.path.join(directorio, f'ingesta_{tamanio_lote}.db')
+    if os.path.exists(base):
+        os.remove(base)
+    entorno = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{base}')
+    salida = subprocess.run(
+        [sys.executable, '-c', _SCRIPT, ruta_csv, str(tamanio_lote)],
+        cwd=raiz, env=entorno, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de memoria de la ingesta de lugares')
+    parser.add_argument('--filas', type=int, nargs='+', default=[20000, 80000, 320000])
+    parser.add_argument('--tamanio-lote', type=int, default=5000)
+    parser.add_argument('--max-crecimiento-mb', type=float, default=40)
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for filas in sorted(args.filas):
+            ruta = os.path.join(directorio, f'alojamientos_{filas}.csv')
+            generar_csv(ruta, filas)
+            mb_csv = os.path.getsize(ruta) / 1024 / 1024
+            for modo, tamanio_lote in (('completo', 0), ('por lotes', args.tamanio_lote)):
+                medicion = medir_carga(ruta, tamanio_lote, directorio)
+                medicion.update(modo=modo, csv_mb=mb_csv)
+                resultados.append(medicion)
+                print(f"{filas:>9,} filas ({mb_csv:6.1f} MB)  {modo:<10} "
+                      f"RSS máximo {medicion['rss_mb']:7.1f} MB  {medicion['segundos']:6.2f}s")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2)
+
+    por_lotes = [r for r in resultados if r['modo'] == 'por lotes']
+    crecimiento = por_lotes[-1]['rss_mb'] - por_lotes[0]['rss_mb']
+    print(f"Crecimiento del RSS por lotes entre {por_lotes[0]['filas']:,} y "
+          f"{por_lotes[-1]['filas']:,} filas: {crecimiento:.1f} MB")
+    if crecimiento > args.max_crecimiento_mb:
+        print(f"❌ El RSS creció más de {args.max_crecimiento_mb} MB con el tamaño del archivo")
+        sys.exit(1)
+    print("✅ Memoria acotada en la carga por lotes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+Benchmark HTTP: latencia, rendimiento y consultas SQL por petición de las rutas principales
+
+Para cada escala de datos arma una base SQLite temporal (datos de prueba de
+init_db.py más datos sintéticos de `flask generar-datos`) y ejecuta los
+escenarios con el cliente de pruebas de Flask, o con --servidor contra un
+servidor WSGI local (werkzeug) y --concurrencia clientes en paralelo.
+
+Registra p50/p95/p99 en ms, peticiones por segundo y consultas SQL por
+petición, y guarda los resultados en JSON. Sale con código 1 si un
+escenario supera su máximo de consultas (CONSULTAS_MAXIMAS) y, con --base,
+si respecto de una corrida anterior algún p95 empeora más que la
+tolerancia o aumentan las consultas por petición.
+
+Uso:
+    python -m benchmarks.latencia [--escalas chica mediana] [--peticiones 200]
+                                  [--servidor] [--concurrencia 4]
+                                  [--salida resultados.json] [--base base.json] [--tolerancia 0.25]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import quote, urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, build_opener
+
+PASSWORD = 'benchmark'
+
+# Volúmenes de `flask generar-datos` por escala
+ESCALAS = {
+    'chica': {'usuarios': 50, 'lugares': 1000, 'itinerarios': 200, 'etapas': 2000},
+    'mediana': {'usuarios': 500, 'lugares': 20000, 'itinerarios': 5000, 'etapas': 50000},
+    'grande': {'usuarios': 1000, 'lugares': 50000, 'itinerarios': 50000, 'etapas': 1000000},
+}
+
+# Consultas SQL por petición que no deben superarse en ninguna escala. Los listados anónimos
+# se fijan en sus escenarios sin cache: con el cache del catálogo no hacen ninguna consulta
+CONSULTAS_MAXIMAS = {
+    'itinerarios.listar (sin cache)': 2,
+    'itinerarios.listar (planificador)': 5,
+    'itinerarios.api_publicos (sin cache)': 2,
+    'itinerarios.detalle': 2,
+    # Una consulta con las columnas necesarias, sin importar la cantidad de lugares (sin N+1)
+    'lugares.buscar': 1,
+    'lugares.buscar (provincia)': 1,
+    'lugares.por_provincia': 1,
+}
+
+# Escenarios que se miden con el cache del catálogo desactivado
+ESCENARIOS_SIN_CACHE = {'itinerarios.listar (sin cache)', 'itinerarios.api_publicos (sin cache)'}
+
+BUSQUEDAS = ['hotel', 'fiesta', 'parque', 'cabañas sal', 'posada', 'festival', 'reserva', 'apart']
+
+
+def _escenarios(ids_itinerarios, ids_provincias):
+    """(nombre, método, generador de rutas o datos, sesión) de cada escenario"""
+    itinerarios = itertools.cycle(ids_itinerarios)
+    provincias = itertools.cycle(ids_provincias)
+    busquedas = itertools.cycle(BUSQUEDAS)
+    return [
+        ('itinerarios.listar', 'GET', lambda: '/itinerarios/', None),
+        ('itinerarios.listar (sin cache)', 'GET', lambda: '/itinerarios/', None),
+        ('itinerarios.listar (planificador)', 'GET', lambda: '/itinerarios/', 'planificador'),
+        ('itinerarios.api_publicos', 'GET', lambda: '/itinerarios/api/publicos', None),
+        ('itinerarios.api_publicos (sin cache)', 'GET', lambda: '/itinerarios/api/publicos', None),
+        ('itinerarios.detalle', 'GET', lambda: f'/itinerarios/{next(itinerarios)}', None),
+        ('lugares.buscar', 'GET', lambda: '/lugares/api/buscar?' + urlencode({'nombre': next(busquedas)}), None),
+        ('lugares.buscar (provincia)', 'GET',
+         lambda: '/lugares/api/buscar?' + urlencode({'provincia_id': next(provincias), 'categoria': 'Alojamiento'}),
+         None),
+        ('lugares.por_provincia', 'GET', lambda: f'/lugares/api/por-provincia/{next(provincias)}', None),
+        ('dashboard.turismo_receptivo', 'GET', lambda: '/dashboard/api/turismo-receptivo', None),
+        ('dashboard.motivos_viaje', 'GET', lambda: '/dashboard/api/motivos-viaje', None),
+        ('dashboard.rangos_edad', 'GET', lambda: '/dashboard/api/rangos-edad', None),
+        ('dashboard.años_disponibles', 'GET', lambda: '/dashboard/api/años-disponibles', None),
+        ('auth.login', 'POST', lambda: '/auth/login', 'login'),
+    ]
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por el método del rango más cercano"""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def _credenciales():
+    return {'email': 'planificador@itinerar.com', 'password': PASSWORD}
+
+
+def preparar_base(ruta, volumenes):
+    """Crea en ruta una base con los datos de prueba y los volúmenes sintéticos indicados"""
+    from sqlalchemy import create_engine
+    from init_db import sembrar
+    from app.datos_sinteticos import generar_datos
+
+    engine = create_engine(f'sqlite:///{ruta}')
+    with contextlib.redirect_stdout(io.StringIO()), engine.begin() as connection:
+        sembrar(connection, PASSWORD)
+        generar_datos(connection, password=PASSWORD, **volumenes)
+    engine.dispose()
+
+
+class _ClienteFlask:
+    """Hace las peticiones con el cliente de pruebas de Flask (en el mismo proceso)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.planificador = app.test_client()
+        self.planificador.post('/auth/login', data=_credenciales())
+
+    def pedir(self, metodo, ruta, sesion):
+        if sesion == 'login':
+            # Cada login con un cliente nuevo (uno ya autenticado solo redirige)
+            return self.app.test_client().post(ruta, data=_credenciales()).status_code
+        cliente = self.planificador if sesion == 'planificador' else self.app.test_client()
+        return cliente.open(ruta, method=metodo).status_code
+
+
+class _SinRedirecciones(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _ClienteServidor:
+    """Hace las peticiones por HTTP contra un servidor WSGI local"""
+
+    def __init__(self, app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class SinRegistro(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.servidor = make_server('127.0.0.1', 0, app, threaded=True, request_handler=SinRegistro)
+        self.base = f'http://127.0.0.1:{self.servidor.server_port}'
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.planificador = self._opener()
+        try:
+            self.planificador.open(self.base + '/auth/login', data=urlencode(_credenciales()).encode())
+        except HTTPError:
+            pass  # la redirección tras el login; la cookie de sesión ya quedó guardada
+
+    @staticmethod
+    def _opener():
+        return build_opener(HTTPCookieProcessor(CookieJar()), _SinRedirecciones())
+
+    def pedir(self, metodo, ruta, sesion):
+        opener = self.planificador if sesion == 'planificador' else self._opener()
+        datos = urlencode(_credenciales()).encode() if metodo == 'POST' else None
+        try:
+            with opener.open(self.base + quote(ruta, safe='/?=&%'), data=datos) as respuesta:
+                respuesta.read()
+                return respuesta.status
+        except HTTPError as e:
+            return e.code
+
+    def cerrar(self):
+        self.servidor.shutdown()
+
+
+def medir_escenario(cliente, contador, metodo, ruta, sesion, peticiones, concurrencia, calentamiento):
+    """Ejecuta el escenario y devuelve sus métricas"""
+    for _ in range(calentamiento):
+        cliente.pedir(metodo, ruta(), sesion)
+
+    def una(_):
+        inicio = time.perf_counter()
+        estado = cliente.pedir(metodo, ruta(), sesion)
+        return time.perf_counter() - inicio, estado
+
+    consultas_antes = contador['consultas']
+    inicio = time.perf_counter()
+    if concurrencia > 1:
+        with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+            resultados = list(executor.map(una, range(peticiones)))
+    else:
+        resultados = [una(i) for i in range(peticiones)]
+    total = time.perf_counter() - inicio
+
+    latencias = [segundos * 1000 for segundos, _ in resultados]
+    return {
+        'peticiones': peticiones,
+        'errores': sum(1 for _, estado in resultados if estado >= 400),
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+        'rps': round(peticiones / total, 1),
+        'consultas_por_peticion': round((contador['consultas'] - consultas_antes) / peticiones, 2),
+    }
+
+
+def medir_escala(nombre, volumenes, args, directorio):
+    """Arma la base de la escala y mide todos los escenarios"""
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.cache_catalogo import cache_catalogo
+    from app.models import Itinerario, Provincia
+
+    ruta = os.path.join(directorio, f'{nombre}.db')
+    inicio = time.perf_counter()
+    preparar_base(ruta, volumenes)
+    print(f"\nEscala {nombre} ({', '.join(f'{v:,} {k}' for k, v in volumenes.items())}), "
+          f"base armada en {time.perf_counter() - inicio:.1f}s")
+
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{ruta}'
+    # Un cache del catálogo por escala: el de instance/ podría tener páginas de otra base
+    os.environ['CATALOGO_CACHE_DIR'] = os.path.join(directorio, f'{nombre}-cache')
+    # Las consultas se cuentan en el engine: sin el índice de autocompletado en segundo plano
+    os.environ['AUTOCOMPLETAR_PRECONSTRUIR'] = '0'
+    app = create_app()
+    contador = {'consultas': 0}
+
+    def contar(*_):
+        contador['consultas'] += 1
+
+    resultados = {}
+    with app.app_context():
+        engine = db.engine
+        ids_itinerarios = [i for (i,) in db.session.query(Itinerario.idItinerario)
+                           .filter_by(esPrivado=0).order_by(Itinerario.idItinerario).limit(500)]
+        ids_provincias = [i for (i,) in db.session.query(Provincia.idProvincia)]
+
+    # Las peticiones se hacen fuera del contexto de aplicación: si no, compartirían `g`
+    # (y con él el usuario de la sesión) entre peticiones
+    event.listen(engine, 'before_cursor_execute', contar)
+    cliente = _ClienteServidor(app) if args.servidor else _ClienteFlask(app)
+    try:
+        for escenario, metodo, ruta_escenario, sesion in _escenarios(ids_itinerarios, ids_provincias):
+            # El login calcula un hash lento a propósito: menos peticiones
+            peticiones = max(10, args.peticiones // 10) if sesion == 'login' else args.peticiones
+            almacen, ttl = cache_catalogo.almacen, cache_catalogo.ttl
+            if escenario in ESCENARIOS_SIN_CACHE:
+                cache_catalogo.configurar(None)
+            try:
+                metricas = medir_escenario(cliente, contador, metodo, ruta_escenario, sesion,
+                                           peticiones, args.concurrencia, args.calentamiento)
+            finally:
+                cache_catalogo.configurar(almacen, ttl)
+            resultados[escenario] = metricas
+            print(f"  {escenario:<36} p50 {metricas['p50_ms']:8.2f}  p95 {metricas['p95_ms']:8.2f}  "
+                  f"p99 {metricas['p99_ms']:8.2f} ms  {metricas['rps']:8.1f} req/s  "
+                  f"{metricas['consultas_por_peticion']:6.2f} consultas"
+                  + (f"  ⚠ {metricas['errores']} errores" if metricas['errores'] else ''))
+    finally:
+        if args.servidor:
+            cliente.cerrar()
+        event.remove(engine, 'before_cursor_execute', contar)
+        engine.dispose()
+    return resultados
+
+
+def excesos_de_consultas(resultados):
+    """Devuelve los escenarios que superan su máximo de consultas por petición"""
+    excesos = []
+    for escala, escenarios in resultados.items():
+        for escenario, maximo in CONSULTAS_MAXIMAS.items():
+            actual = escenarios.get(escenario)
+            if actual is not None and actual['consultas_por_peticion'] > maximo:
+                excesos.append(f"{escala} / {escenario}: {actual['consultas_por_peticion']} consultas "
+                               f"por petición (máximo {maximo})")
+    return excesos
+
+
+def comparar(resultados, base, tolerancia, minimo_ms=1.0):
+    """Devuelve la lista de regresiones de resultados respecto de la base"""
+    regresiones = []
+    for escala, escenarios in resultados.items():
+        for escenario, actual in escenarios.items():
+            anterior = base.get(escala, {}).get(escenario)
+            if anterior is None:
+                continue
+            limite = max(anterior['p95_ms'] * (1 + tolerancia), anterior['p95_ms'] + minimo_ms)
+            if actual['p95_ms'] > limite:
+                regresiones.append(f"{escala} / {escenario}: p95 {actual['p95_ms']:.2f} ms "
+                                   f"(base {anterior['p95_ms']:.2f} ms)")
+            if actual['consultas_por_peticion'] > anterior['consultas_por_peticion']:
+                regresiones.append(f"{escala} / {escenario}: {actual['consultas_por_peticion']} consultas "
+                                   f"por petición (base {anterior['consultas_por_peticion']})")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de latencia HTTP de las rutas principales')
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=['chica', 'mediana'])
+    parser.add_argument('--peticiones', type=int, default=200)
+    parser.add_argument('--calentamiento', type=int, default=5)
+    parser.add_argument('--servidor', action='store_true', help='mide contra un servidor WSGI local')
+    parser.add_argument('--concurrencia', type=int, default=1)
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--base', help='resultados JSON de referencia para detectar regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='aumento del p95 tolerado (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(raiz)
+    sys.path.insert(0, raiz)
+    os.environ.setdefault('DEFAULT_PASSWORD', PASSWORD)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for escala in args.escalas:
+            resultados[escala] = medir_escala(escala, ESCALAS[escala], args, directorio)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'modo': 'servidor' if args.servidor else 'cliente de pruebas',
+                'concurrencia': args.concurrencia,
+                'resultados': resultados,
+            }, archivo, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+    regresiones = excesos_de_consultas(resultados)
+    if args.base:
+        with open(args.base, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        modo = 'servidor' if args.servidor else 'cliente de pruebas'
+        if (base.get('modo'), base.get('concurrencia')) != (modo, args.concurrencia):
+            print(f"⚠ La base se midió en modo {base.get('modo')} con concurrencia {base.get('concurrencia')}")
+        regresiones += comparar(resultados, base['resultados'], args.tolerancia)
+    if regresiones:
+        for regresion in regresiones:
+            print(f"❌ {regresion}")
+        sys.exit(1)
+    print("✅ Sin regresiones" + (f" respecto de {args.base}" if args.base else ''))
+
+if __name__ == '__main__':
+    main()
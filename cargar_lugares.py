@@ -1,215 +1,639 @@
 """
 Script para cargar lugares de interés desde archivos CSV a la base de datos
+
+La carga es por conjuntos: se precargan una sola vez las provincias, las
+ciudades y las claves (nombre, categoría) de los lugares existentes, se
+resuelven las claves foráneas con merges de pandas y se insertan las filas
+nuevas en lotes (executemany), en lugar de hacer varias consultas por fila.
+
+Con --sincronizar se hace una sincronización incremental por la clave
+(categoría, fuente, identificadorExterno): se compara el hash del
+contenido de cada fila con el guardado en la base y solo se insertan,
+actualizan (INSERT ... ON CONFLICT) o eliminan las filas que cambiaron.
+
+Los datasets se declaran en FUENTES. La lectura y normalización de cada
+archivo corre en un pool de procesos; el proceso principal es el único que
+escribe en la base, a medida que cada archivo termina de procesarse.
+
+Con --por-lotes N cada archivo se lee, normaliza y escribe de a N filas
+(pd.read_csv con chunksize), así la memoria no depende del tamaño del
+archivo. Las consultas de existentes se hacen solo sobre las claves del
+lote, y en modo sincronización solo se acumulan las claves vistas.
 """
+import argparse
+import hashlib
+import itertools
+import time
+from datetime import datetime
 import pandas as pd
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from app import create_app, db
-from app.models import Provincia, Ciudad, LugarInteres
+from app.models import Provincia, Ciudad, LugarInteres, CargaArchivo
+from app.utils import normalizar_texto
+
+FUENTE_POR_DEFECTO = 'datos.gob.ar'
+TAMANIO_LOTE = 1000
+TAMANIO_CONSULTA = 500  # Valores por consulta con IN (límite de parámetros de SQLite)
+
+# Columna del modelo -> columna del CSV
+COLUMNAS_POR_DEFECTO = {
+    'nombre': 'nombre',
+    'provincia': 'provincia',
+    'ciudad': 'ciudad',
+    'fuente': 'fuente',
+    'identificadorExterno': 'id',
+    'enlaceFicha': 'enlace',
+}
+
+
+@dataclass
+class FuenteDatos:
+    """Dataset de lugares de interés de una categoría, ubicado en data/"""
+    archivo: str
+    categoria: str
+    etiqueta: str
+    columnas: dict = field(default_factory=lambda: dict(COLUMNAS_POR_DEFECTO))
+    requeridas: tuple = ('nombre',)  # Columnas del modelo que el CSV debe tener
+
+    @property
+    def usar_ciudad(self):
+        return 'ciudad' in self.columnas
+
+
+# Registro de datasets: agregar uno es agregar una entrada
+FUENTES = [
+    FuenteDatos('parques_nacionales.csv', 'Parque Nacional', 'Parques Nacionales',
+                columnas={k: v for k, v in COLUMNAS_POR_DEFECTO.items() if k != 'ciudad'}),
+    FuenteDatos('alojamientos.csv', 'Alojamiento', 'Alojamientos'),
+    FuenteDatos('fiestas_eventos.csv', 'Fiesta/Evento', 'Fiestas/Eventos'),
+]
+
+
+def _texto(serie):
+    """Limpia una columna de texto: quita espacios y deja None en vacíos"""
+    serie = serie.astype('string').str.strip()
+    return serie.astype(object).where(serie.notna() & (serie != ''), None)
+
+
+def _columna(df, nombre):
+    """Devuelve la columna limpia o una columna vacía si el CSV no la tiene"""
+    if nombre is not None and nombre in df.columns:
+        return _texto(df[nombre])
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def _insertar_en_lotes(tabla, filas):
+    """Inserta las filas (dicts) en lotes con executemany"""
+    for inicio in range(0, len(filas), TAMANIO_LOTE):
+        db.session.execute(tabla.insert(), filas[inicio:inicio + TAMANIO_LOTE])
+
+
+def _resolver_provincias(df):
+    """Agrega la columna idProvincia, creando en bloque las provincias que falten"""
+    provincias = dict(db.session.query(Provincia.nombre, Provincia.idProvincia).all())
+
+    faltantes = sorted(set(df['provincia'].dropna()) - set(provincias))
+    if faltantes:
+        _insertar_en_lotes(Provincia.__table__, [
+            {'nombre': nombre, 'nombreNormalizado': normalizar_texto(nombre)} for nombre in faltantes
+        ])
+        provincias = dict(db.session.query(Provincia.nombre, Provincia.idProvincia).all())
+
+    mapa = pd.DataFrame(list(provincias.items()), columns=['provincia', 'idProvincia']).astype({'idProvincia': 'Int64'})
+    return df.merge(mapa, on='provincia', how='left')
+
+
+def _resolver_ciudades(df):
+    """Agrega la columna idCiudad, creando en bloque las ciudades que falten"""
+    def mapa_ciudades():
+        filas = db.session.query(Ciudad.idProvincia, Ciudad.nombre, Ciudad.idCiudad).all()
+        return pd.DataFrame(filas, columns=['idProvincia', 'ciudad', 'idCiudad']).astype(
+            {'idProvincia': 'Int64', 'idCiudad': 'Int64'})
+
+    con_ciudad = df[df['ciudad'].notna() & df['idProvincia'].notna()]
+    mapa = mapa_ciudades()
+    pares = con_ciudad[['idProvincia', 'ciudad']].drop_duplicates()
+    faltantes = pares.merge(mapa, on=['idProvincia', 'ciudad'], how='left')
+    faltantes = faltantes[faltantes['idCiudad'].isna()]
+    if not faltantes.empty:
+        _insertar_en_lotes(Ciudad.__table__, [
+            {'idProvincia': int(id_provincia), 'nombre': nombre, 'nombreNormalizado': normalizar_texto(nombre)}
+            for id_provincia, nombre in faltantes[['idProvincia', 'ciudad']].itertuples(index=False)
+        ])
+        mapa = mapa_ciudades()
+
+    return df.merge(mapa, on=['idProvincia', 'ciudad'], how='left')
+
+
+COLUMNAS_LUGAR = ['nombre', 'idProvincia', 'idCiudad', 'fuente', 'identificadorExterno',
+                  'enlaceFicha', 'hashContenido']
+
+
+def _hash_contenido(nombre, provincia, ciudad, enlace):
+    """Hash de los datos de origen de un lugar, para detectar cambios"""
+    contenido = '\x1f'.join(v or '' for v in (nombre, provincia, ciudad, enlace))
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+def _preparar(df, fuente):
+    """Normaliza las columnas del CSV y calcula el hash de contenido de cada fila"""
+    faltantes = [c for c in fuente.requeridas if fuente.columnas.get(c) not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas requeridas en {fuente.archivo}: {', '.join(faltantes)}")
+
+    lugares = pd.DataFrame({c: _columna(df, fuente.columnas.get(c)) for c in COLUMNAS_POR_DEFECTO})
+    lugares['fuente'] = lugares['fuente'].fillna(FUENTE_POR_DEFECTO)
+    lugares = lugares.dropna(subset=list(fuente.requeridas)).copy()
+    lugares['hashContenido'] = [
+        _hash_contenido(*valores)
+        for valores in lugares[['nombre', 'provincia', 'ciudad', 'enlaceFicha']].itertuples(index=False)
+    ]
+    return lugares
+
+
+def _resolver_claves(lugares, usar_ciudad):
+    """Agrega idProvincia e idCiudad resolviendo las claves foráneas con merges"""
+    lugares = _resolver_provincias(lugares)
+    if usar_ciudad:
+        lugares = _resolver_ciudades(lugares)
+    else:
+        lugares['idCiudad'] = None
+    return lugares
+
+
+def _filas_lugar(lugares, categoria):
+    """Convierte el DataFrame resuelto en dicts listos para insertar"""
+    lugares = lugares[COLUMNAS_LUGAR].astype(object)
+    lugares = lugares.where(lugares.notna(), None)
+    return [
+        {
+            'nombre': nombre,
+            'nombreNormalizado': normalizar_texto(nombre),
+            'categoria': categoria,
+            'idProvincia': int(id_provincia) if id_provincia is not None else None,
+            'idCiudad': int(id_ciudad) if id_ciudad is not None else None,
+            'fuente': fuente,
+            'identificadorExterno': identificador,
+            'enlaceFicha': enlace,
+            'hashContenido': hash_contenido,
+        }
+        for nombre, id_provincia, id_ciudad, fuente, identificador, enlace, hash_contenido
+        in lugares.itertuples(index=False)
+    ]
+
+
+def _lotes(valores, tamanio=TAMANIO_CONSULTA):
+    """Parte una lista de valores en lotes para consultas con IN"""
+    for inicio in range(0, len(valores), tamanio):
+        yield valores[inicio:inicio + tamanio]
+
+
+def _claves_externas(lugares):
+    """Pares (fuente, identificadorExterno) distintos de los lugares que tienen id"""
+    pares = lugares[['fuente', 'identificadorExterno']].dropna().drop_duplicates()
+    return list(pares.itertuples(index=False, name=None))
+
+
+def _consultar_por_clave_externa(columnas, categoria, pares):
+    """Filas (columnas) de los lugares de la categoría con esos pares (fuente, id externo).
+
+    Se consulta por fuente con IN sobre el id, así se usa el índice único completo.
+    """
+    por_fuente = {}
+    for fuente, identificador in pares:
+        por_fuente.setdefault(fuente, []).append(identificador)
+    filas = []
+    for fuente, identificadores in por_fuente.items():
+        for lote in _lotes(identificadores):
+            filas.extend(db.session.query(*columnas).filter(
+                LugarInteres.categoria == categoria, LugarInteres.fuente == fuente,
+                LugarInteres.identificadorExterno.in_(lote)))
+    return filas
+
+
+def leer_fuente(fuente, path):
+    """Lee y normaliza un CSV completo. Corre en un proceso del pool, sin tocar la base.
+
+    Devuelve (columnas del CSV, filas leídas, lugares, segundos).
+    """
+    inicio = time.perf_counter()
+    df = pd.read_csv(path, dtype=str)
+    lugares = _preparar(df, fuente)
+    return list(df.columns), len(df), lugares, time.perf_counter() - inicio
+
+
+def _preparar_lote(df, fuente):
+    return len(df), _preparar(df, fuente)
+
+
+def leer_por_lotes(fuente, path, tamanio, workers=1, desde_lote=0, claves_saltadas=None):
+    """Genera (filas leídas, lugares) leyendo el CSV de a `tamanio` filas.
+
+    La memoria queda acotada por el tamaño del lote: el siguiente se lee
+    recién cuando el escritor pide más. Con workers > 1 la normalización
+    corre en un pool con a lo sumo dos lotes por proceso en vuelo.
+
+    Para reanudar una carga, los primeros `desde_lote` lotes se leen pero no
+    se devuelven; si se pasa el set claves_saltadas, se agregan en él sus
+    claves externas (las necesita la sincronización para no eliminarlos).
+    """
+    total_bytes = os.path.getsize(path) or 1
+    leidas = 0
+    with open(path, 'rb') as archivo:
+        lector = iter(pd.read_csv(archivo, dtype=str, chunksize=tamanio))
+
+        def informar(filas):
+            nonlocal leidas
+            leidas += filas
+            avance = min(archivo.tell() / total_bytes, 1)
+            print(f"\r  Progreso: {avance:4.0%} ({leidas:,} filas)", end='', flush=True)
+
+        for df in itertools.islice(lector, desde_lote):
+            if claves_saltadas is not None:
+                claves_saltadas.update(_claves_externas(_preparar(df, fuente)))
+            informar(len(df))
+
+        if workers <= 1:
+            for df in lector:
+                filas, lugares = _preparar_lote(df, fuente)
+                del df
+                yield filas, lugares
+                informar(filas)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pendientes = deque()
+                for df in lector:
+                    pendientes.append(executor.submit(_preparar_lote, df, fuente))
+                    del df
+                    if len(pendientes) >= 2 * workers:
+                        filas, lugares = pendientes.popleft().result()
+                        yield filas, lugares
+                        informar(filas)
+                while pendientes:
+                    filas, lugares = pendientes.popleft().result()
+                    yield filas, lugares
+                    informar(filas)
+    print()
+
+
+def cargar_lugares(lugares, categoria, usar_ciudad=True):
+    """Inserta, sin confirmar, los lugares que todavía no existen. Devuelve (cargados, tiempos)"""
+    tiempos = {}
+
+    # Descartar repetidos en el lote y los que ya existen (misma clave nombre + categoría)
+    t = time.perf_counter()
+    lugares = lugares.drop_duplicates('nombre')
+    # (se filtra la categoría en Python para que la consulta use el índice por nombre)
+    existentes = set()
+    for lote in _lotes(list(lugares['nombre'])):
+        existentes.update(n for n, c in db.session.query(LugarInteres.nombre, LugarInteres.categoria)
+                          .filter(LugarInteres.nombre.in_(lote)) if c == categoria)
+    lugares = lugares[~lugares['nombre'].isin(existentes)].copy()
+
+    # El id externo es clave única por categoría y fuente: si se repite en el
+    # lote o ya lo tiene otro lugar, la fila se carga sin él
+    claves = ['fuente', 'identificadorExterno']
+    tomados = set(_consultar_por_clave_externa(
+        (LugarInteres.fuente, LugarInteres.identificadorExterno), categoria, _claves_externas(lugares)))
+    repetidos = lugares.duplicated(claves) | pd.Series(
+        [par in tomados for par in lugares[claves].itertuples(index=False, name=None)], index=lugares.index)
+    lugares.loc[repetidos, 'identificadorExterno'] = None
+
+    # Resolver claves foráneas con merges
+    lugares = _resolver_claves(lugares, usar_ciudad)
+    tiempos['resolucion'] = time.perf_counter() - t
+
+    # Insertar en lotes
+    t = time.perf_counter()
+    filas = _filas_lugar(lugares, categoria)
+    _insertar_en_lotes(LugarInteres.__table__, filas)
+    tiempos['insercion'] = time.perf_counter() - t
+
+    return len(filas), tiempos
+
+
+def _upsert_en_lotes(filas):
+    """Inserta o actualiza lugares por su clave de sincronización (INSERT ... ON CONFLICT)"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
 
-def cargar_lugares_desde_csv():
-    """Carga lugares de interés desde archivos CSV en la carpeta data/"""
+    tabla = LugarInteres.__table__
+    clave = ['categoria', 'fuente', 'identificadorExterno']
+    for inicio in range(0, len(filas), TAMANIO_LOTE):
+        sentencia = insert(tabla)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=clave,
+            set_={c: sentencia.excluded[c] for c in filas[0] if c not in clave}
+        )
+        db.session.execute(sentencia, filas[inicio:inicio + TAMANIO_LOTE])
+
+
+def sincronizar_lugares(lugares, categoria, usar_ciudad=True):
+    """Inserta o actualiza, sin confirmar, los lugares que cambiaron por (categoría, fuente, id externo).
+
+    Devuelve (cambios, tiempos), donde cambios cuenta insertados,
+    actualizados y filas sin identificador (ignoradas).
+    """
+    tiempos = {}
+
+    t = time.perf_counter()
+    sin_id = int(lugares['identificadorExterno'].isna().sum())
+    lugares = lugares[lugares['identificadorExterno'].notna()]
+    lugares = lugares.drop_duplicates(['fuente', 'identificadorExterno'], keep='last')
+
+    # Hash guardado de los lugares del lote que ya están en la base
+    actuales = pd.DataFrame(
+        _consultar_por_clave_externa(
+            (LugarInteres.fuente, LugarInteres.identificadorExterno, LugarInteres.hashContenido),
+            categoria, _claves_externas(lugares)),
+        columns=['fuente', 'identificadorExterno', 'hashActual']
+    )
+    diff = lugares.merge(actuales, on=['fuente', 'identificadorExterno'], how='left', indicator=True)
+    nuevos = diff['_merge'] == 'left_only'
+    modificados = (diff['_merge'] == 'both') & (diff['hashContenido'] != diff['hashActual'])
+
+    # Solo se resuelven claves foráneas de las filas que cambian
+    cambios = _resolver_claves(diff.loc[nuevos | modificados, lugares.columns], usar_ciudad)
+    tiempos['resolucion'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    filas = _filas_lugar(cambios, categoria)
+    if filas:
+        _upsert_en_lotes(filas)
+    tiempos['insercion'] = time.perf_counter() - t
+
+    return {
+        'insertados': int(nuevos.sum()),
+        'actualizados': int(modificados.sum()),
+        'sin_id': sin_id,
+    }, tiempos
+
+
+def eliminar_ausentes(categoria, claves_vistas):
+    """Elimina los lugares de la categoría cuyas claves (fuente, id externo) no se vieron.
+
+    Solo considera las fuentes presentes en claves_vistas. Devuelve la cantidad eliminada.
+    """
+    from app.models import Etapa
+
+    fuentes = {fuente for fuente, _ in claves_vistas}
+    if not fuentes:
+        return 0
+    ids = [
+        id_lugar for id_lugar, fuente, identificador in
+        db.session.query(LugarInteres.idLugarInteres, LugarInteres.fuente, LugarInteres.identificadorExterno)
+        .filter(LugarInteres.categoria == categoria, LugarInteres.fuente.in_(fuentes),
+                LugarInteres.identificadorExterno.isnot(None))
+        .yield_per(TAMANIO_CONSULTA)
+        if (fuente, identificador) not in claves_vistas
+    ]
+    for lote in _lotes(ids):
+        # Las etapas que apuntaban al lugar lo pierden, pero no se eliminan
+        Etapa.query.filter(Etapa.idLugarInteres.in_(lote)).update(
+            {Etapa.idLugarInteres: None}, synchronize_session=False)
+        LugarInteres.query.filter(LugarInteres.idLugarInteres.in_(lote)).delete(
+            synchronize_session=False)
+    db.session.commit()
+    return len(ids)
+
+
+def escribir_fuente(fuente, lotes, sincronizar=False, registro=None, claves_vistas=None):
+    """Escribe en la base los lotes (filas leídas, lugares) de una fuente.
+
+    Cada lote se confirma en su propia transacción, junto con el avance en
+    el registro de la corrida (CargaArchivo) si se pasa uno. En modo
+    sincronización, al final elimina los lugares que no aparecieron en
+    ningún lote ni en claves_vistas. Devuelve (resumen, filas leídas, tiempos).
+    """
+    resumen = {'insertados': 0, 'actualizados': 0, 'eliminados': 0, 'sin_id': 0}
+    tiempos = {'lectura': 0.0, 'resolucion': 0.0, 'insercion': 0.0}
+    claves_vistas = claves_vistas if claves_vistas is not None else set()
+    leidas = 0
+
+    lotes = iter(lotes)
+    while True:
+        t = time.perf_counter()
+        siguiente = next(lotes, None)
+        tiempos['lectura'] += time.perf_counter() - t
+        if siguiente is None:
+            break
+        filas, lugares = siguiente
+        leidas += filas
+
+        if sincronizar:
+            claves_vistas.update(_claves_externas(lugares))
+            cambios, tiempos_lote = sincronizar_lugares(lugares, fuente.categoria, fuente.usar_ciudad)
+        else:
+            cargados, tiempos_lote = cargar_lugares(lugares, fuente.categoria, fuente.usar_ciudad)
+            cambios = {'insertados': cargados}
+
+        t = time.perf_counter()
+        if registro is not None:
+            registro.lotesConfirmados += 1
+            registro.filasLeidas += filas
+            registro.filasCargadas += cambios['insertados'] + cambios.get('actualizados', 0)
+        db.session.commit()
+        tiempos_lote['insercion'] += time.perf_counter() - t
+
+        for clave, valor in cambios.items():
+            resumen[clave] += valor
+        for clave, valor in tiempos_lote.items():
+            tiempos[clave] += valor
+
+    if sincronizar:
+        t = time.perf_counter()
+        resumen['eliminados'] = eliminar_ausentes(fuente.categoria, claves_vistas)
+        tiempos['insercion'] += time.perf_counter() - t
+
+    if registro is not None:
+        registro.estado = 'completa'
+        registro.fin = _ahora()
+        db.session.commit()
+
+    return resumen, leidas, tiempos
+
+
+def _ahora():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def checksum_archivo(path):
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    suma = hashlib.sha256()
+    with open(path, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            suma.update(bloque)
+    return suma.hexdigest()
+
+
+def registro_de_corrida(fuente, checksum, modo, tamanio_lote=None, forzar=False):
+    """Devuelve el registro (CargaArchivo) de la corrida del archivo, o None si no hace falta.
+
+    Si la última corrida del archivo en ese modo terminó con el mismo checksum,
+    el archivo no cambió y se omite (salvo con forzar). Si quedó incompleta
+    con el mismo checksum y tamaño de lote, se reanuda desde su último lote.
+    """
+    anterior = (CargaArchivo.query
+                .filter_by(archivo=fuente.archivo, categoria=fuente.categoria, modo=modo)
+                .order_by(CargaArchivo.idCarga.desc())
+                .first())
+    if anterior is not None and anterior.checksum == checksum:
+        if anterior.estado == 'completa':
+            if not forzar:
+                return None
+        elif tamanio_lote and anterior.tamanioLote == tamanio_lote:
+            anterior.estado = 'en_curso'
+            anterior.error = None
+            db.session.commit()
+            return anterior
+
+    registro = CargaArchivo(archivo=fuente.archivo, categoria=fuente.categoria, modo=modo,
+                            checksum=checksum, tamanioLote=tamanio_lote, estado='en_curso',
+                            lotesConfirmados=0, filasLeidas=0, filasCargadas=0, inicio=_ahora())
+    db.session.add(registro)
+    db.session.commit()
+    return registro
+
+
+def _marcar_fallida(registro, error):
+    registro.estado = 'fallida'
+    registro.error = str(error)
+    registro.fin = _ahora()
+    db.session.commit()
+
+
+def _imprimir_tiempos(filas_leidas, tiempos):
+    total = tiempos['lectura'] + tiempos['resolucion'] + tiempos['insercion']
+    velocidad = filas_leidas / total if total else 0
+    print(f"  Tiempos: lectura {tiempos['lectura']:.2f}s, resolución {tiempos['resolucion']:.2f}s, "
+          f"inserción {tiempos['insercion']:.2f}s, total {total:.2f}s ({velocidad:,.0f} filas/s)")
+
+
+def _imprimir_resumen(fuente, resumen, sincronizar):
+    if sincronizar:
+        print(f"  ✓ {fuente.etiqueta}: {resumen['insertados']} nuevos, "
+              f"{resumen['actualizados']} actualizados, {resumen['eliminados']} eliminados "
+              f"({resumen['sin_id']} filas sin id ignoradas)")
+    else:
+        print(f"  ✓ {fuente.etiqueta} cargados: {resumen['insertados']}")
+
+
+def _lecturas(tareas, workers):
+    """Genera (fuente, path, resultado o excepción) de cada archivo a medida que termina de leerse"""
+    if workers <= 1:
+        for fuente, path in tareas:
+            try:
+                yield fuente, path, leer_fuente(fuente, path)
+            except Exception as e:
+                yield fuente, path, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {executor.submit(leer_fuente, fuente, path): (fuente, path) for fuente, path in tareas}
+        for futuro in as_completed(futuros):
+            try:
+                yield *futuros[futuro], futuro.result()
+            except Exception as e:
+                yield *futuros[futuro], e
+
+
+def cargar_lugares_desde_csv(sincronizar=False, workers=None, fuentes=FUENTES, tamanio_lote=None,
+                             forzar=False):
+    """Carga lugares de interés desde archivos CSV en la carpeta data/
+
+    Con tamanio_lote, cada archivo se procesa por partes de esa cantidad de
+    filas (memoria acotada); si no, cada archivo se lee completo. Cada
+    corrida queda registrada en carga_archivo: los archivos sin cambios
+    desde la última carga completa se omiten y las cargas por lotes
+    interrumpidas se reanudan desde el último lote confirmado.
+    """
     app = create_app()
-    
+
     with app.app_context():
         # Ruta a la carpeta de datos
         data_dir = os.path.join(os.path.dirname(__file__), 'data')
-        
+
         # Verificar que existe la carpeta
         if not os.path.exists(data_dir):
             print(f"Creando carpeta {data_dir}...")
             os.makedirs(data_dir)
             print("Carpeta creada. Por favor, coloca tus archivos CSV allí.")
             return
-        
+
         # Contador de lugares cargados
         lugares_cargados = 0
-        
-        # 1. Cargar Parques Nacionales
-        parques_file = os.path.join(data_dir, 'parques_nacionales.csv')
-        if os.path.exists(parques_file):
-            print(f"Cargando {parques_file}...")
-            try:
-                df = pd.read_csv(parques_file)
-                print(f"  Columnas encontradas: {list(df.columns)}")
-                
-                for _, row in df.iterrows():
-                    nombre = str(row.get('nombre', '')).strip()
-                    provincia_nombre = str(row.get('provincia', '')).strip()
-                    
-                    if not nombre or nombre == 'nan':
-                        continue
-                    
-                    # Buscar o crear provincia
-                    provincia = Provincia.query.filter_by(nombre=provincia_nombre).first()
-                    if not provincia and provincia_nombre:
-                        provincia = Provincia(nombre=provincia_nombre)
-                        db.session.add(provincia)
-                        db.session.flush()
-                    
-                    # Verificar si ya existe
-                    lugar_existente = LugarInteres.query.filter_by(
-                        nombre=nombre,
-                        categoria='Parque Nacional'
-                    ).first()
-                    
-                    if not lugar_existente:
-                        lugar = LugarInteres(
-                            nombre=nombre,
-                            categoria='Parque Nacional',
-                            idProvincia=provincia.idProvincia if provincia else None,
-                            fuente=row.get('fuente', 'datos.gob.ar'),
-                            identificadorExterno=str(row.get('id', '')),
-                            enlaceFicha=row.get('enlace', '')
-                        )
-                        db.session.add(lugar)
-                        lugares_cargados += 1
-                
-                db.session.commit()
-                print(f"  ✓ Parques Nacionales cargados: {lugares_cargados}")
-            except Exception as e:
-                db.session.rollback()
-                print(f"  ✗ Error al cargar parques nacionales: {e}")
-        else:
-            print(f"  ⚠ Archivo no encontrado: {parques_file}")
-        
-        # 2. Cargar Alojamientos
-        alojamientos_file = os.path.join(data_dir, 'alojamientos.csv')
-        if os.path.exists(alojamientos_file):
-            print(f"\nCargando {alojamientos_file}...")
-            try:
-                df = pd.read_csv(alojamientos_file)
-                print(f"  Columnas encontradas: {list(df.columns)}")
-                
-                lugares_aloj = 0
-                for _, row in df.iterrows():
-                    nombre = str(row.get('nombre', '')).strip()
-                    provincia_nombre = str(row.get('provincia', '')).strip()
-                    ciudad_nombre = str(row.get('ciudad', '')).strip()
-                    
-                    if not nombre or nombre == 'nan':
-                        continue
-                    
-                    # Buscar o crear provincia
-                    provincia = None
-                    if provincia_nombre:
-                        provincia = Provincia.query.filter_by(nombre=provincia_nombre).first()
-                        if not provincia:
-                            provincia = Provincia(nombre=provincia_nombre)
-                            db.session.add(provincia)
-                            db.session.flush()
-                    
-                    # Buscar o crear ciudad
-                    ciudad = None
-                    if ciudad_nombre and provincia:
-                        ciudad = Ciudad.query.filter_by(
-                            nombre=ciudad_nombre,
-                            idProvincia=provincia.idProvincia
-                        ).first()
-                        if not ciudad:
-                            ciudad = Ciudad(nombre=ciudad_nombre, idProvincia=provincia.idProvincia)
-                            db.session.add(ciudad)
-                            db.session.flush()
-                    
-                    # Verificar si ya existe
-                    lugar_existente = LugarInteres.query.filter_by(
-                        nombre=nombre,
-                        categoria='Alojamiento'
-                    ).first()
-                    
-                    if not lugar_existente:
-                        lugar = LugarInteres(
-                            nombre=nombre,
-                            categoria='Alojamiento',
-                            idProvincia=provincia.idProvincia if provincia else None,
-                            idCiudad=ciudad.idCiudad if ciudad else None,
-                            fuente=row.get('fuente', 'datos.gob.ar'),
-                            identificadorExterno=str(row.get('id', '')),
-                            enlaceFicha=row.get('enlace', '')
-                        )
-                        db.session.add(lugar)
-                        lugares_aloj += 1
-                
-                db.session.commit()
-                print(f"  ✓ Alojamientos cargados: {lugares_aloj}")
-                lugares_cargados += lugares_aloj
-            except Exception as e:
-                db.session.rollback()
-                print(f"  ✗ Error al cargar alojamientos: {e}")
+        inicio = time.perf_counter()
+        modo = 'sincronizacion' if sincronizar else 'carga'
+
+        tareas = []
+        registros = {}
+        for fuente in fuentes:
+            path = os.path.join(data_dir, fuente.archivo)
+            if not os.path.exists(path):
+                print(f"  ⚠ Archivo no encontrado: {path}")
+                continue
+            registro = registro_de_corrida(fuente, checksum_archivo(path), modo, tamanio_lote, forzar)
+            if registro is None:
+                print(f"  = {fuente.archivo} sin cambios desde la última carga, se omite")
+                continue
+            tareas.append((fuente, path))
+            registros[path] = registro
+        if workers is None:
+            workers = max(1, min(len(tareas), os.cpu_count() or 1))
+
+        if tamanio_lote:
+            # Por partes: los archivos de a uno, y el pool normaliza los lotes de cada archivo
+            lecturas = ((fuente, path, None) for fuente, path in tareas)
         else:
-            print(f"  ⚠ Archivo no encontrado: {alojamientos_file}")
-        
-        # 3. Cargar Fiestas/Eventos
-        fiestas_file = os.path.join(data_dir, 'fiestas_eventos.csv')
-        if os.path.exists(fiestas_file):
-            print(f"\nCargando {fiestas_file}...")
+            # Un único escritor: cada archivo se escribe en cuanto termina su lectura
+            lecturas = _lecturas(tareas, workers)
+
+        for fuente, path, resultado in lecturas:
+            registro = registros[path]
+            print(f"\n{'Sincronizando' if sincronizar else 'Cargando'} {fuente.archivo}...")
             try:
-                df = pd.read_csv(fiestas_file)
-                print(f"  Columnas encontradas: {list(df.columns)}")
-                
-                lugares_fiestas = 0
-                for _, row in df.iterrows():
-                    nombre = str(row.get('nombre', '')).strip()
-                    provincia_nombre = str(row.get('provincia', '')).strip()
-                    ciudad_nombre = str(row.get('ciudad', '')).strip()
-                    
-                    if not nombre or nombre == 'nan':
-                        continue
-                    
-                    # Buscar o crear provincia
-                    provincia = None
-                    if provincia_nombre:
-                        provincia = Provincia.query.filter_by(nombre=provincia_nombre).first()
-                        if not provincia:
-                            provincia = Provincia(nombre=provincia_nombre)
-                            db.session.add(provincia)
-                            db.session.flush()
-                    
-                    # Buscar o crear ciudad
-                    ciudad = None
-                    if ciudad_nombre and provincia:
-                        ciudad = Ciudad.query.filter_by(
-                            nombre=ciudad_nombre,
-                            idProvincia=provincia.idProvincia
-                        ).first()
-                        if not ciudad:
-                            ciudad = Ciudad(nombre=ciudad_nombre, idProvincia=provincia.idProvincia)
-                            db.session.add(ciudad)
-                            db.session.flush()
-                    
-                    # Verificar si ya existe
-                    lugar_existente = LugarInteres.query.filter_by(
-                        nombre=nombre,
-                        categoria='Fiesta/Evento'
-                    ).first()
-                    
-                    if not lugar_existente:
-                        lugar = LugarInteres(
-                            nombre=nombre,
-                            categoria='Fiesta/Evento',
-                            idProvincia=provincia.idProvincia if provincia else None,
-                            idCiudad=ciudad.idCiudad if ciudad else None,
-                            fuente=row.get('fuente', 'datos.gob.ar'),
-                            identificadorExterno=str(row.get('id', '')),
-                            enlaceFicha=row.get('enlace', '')
-                        )
-                        db.session.add(lugar)
-                        lugares_fiestas += 1
-                
-                db.session.commit()
-                print(f"  ✓ Fiestas/Eventos cargados: {lugares_fiestas}")
-                lugares_cargados += lugares_fiestas
+                if tamanio_lote:
+                    desde = registro.lotesConfirmados
+                    claves_saltadas = set() if sincronizar else None
+                    if desde:
+                        print(f"  Reanudando desde el lote {desde + 1} ({registro.filasLeidas:,} filas ya confirmadas)")
+                    lotes = leer_por_lotes(fuente, path, tamanio_lote, workers, desde, claves_saltadas)
+                    resumen, leidas, tiempos = escribir_fuente(fuente, lotes, sincronizar, registro, claves_saltadas)
+                else:
+                    if isinstance(resultado, Exception):
+                        raise resultado
+                    columnas, leidas, lugares, lectura = resultado
+                    print(f"  Columnas encontradas: {columnas}")
+                    resumen, leidas, tiempos = escribir_fuente(fuente, [(leidas, lugares)], sincronizar, registro)
+                    tiempos['lectura'] = lectura
+                _imprimir_resumen(fuente, resumen, sincronizar)
+                _imprimir_tiempos(leidas, tiempos)
+                lugares_cargados += resumen['insertados']
             except Exception as e:
                 db.session.rollback()
-                print(f"  ✗ Error al cargar fiestas/eventos: {e}")
-        else:
-            print(f"  ⚠ Archivo no encontrado: {fiestas_file}")
-        
+                _marcar_fallida(registro, e)
+                print(f"  ✗ Error al cargar {fuente.etiqueta.lower()}: {e}")
+
         print("\n" + "="*50)
         print(f"Total de lugares de interés cargados: {lugares_cargados}")
+        print(f"Tiempo total: {time.perf_counter() - inicio:.2f}s ({workers} procesos de lectura)")
         print("="*50)
 
 if __name__ == '__main__':
-    cargar_lugares_desde_csv()
-
-
-
+    parser = argparse.ArgumentParser(description='Carga lugares de interés desde los CSV de data/')
+    parser.add_argument('--sincronizar', action='store_true',
+                        help='sincronización incremental por id externo (inserta, actualiza y elimina)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='procesos de lectura en paralelo (por defecto, uno por archivo; 1 = sin pool)')
+    parser.add_argument('--por-lotes', type=int, default=None, metavar='FILAS',
+                        help='procesa cada archivo por partes de FILAS filas, con memoria acotada')
+    parser.add_argument('--forzar', action='store_true',
+                        help='procesa también los archivos que no cambiaron desde la última carga')
+    args = parser.parse_args()
+    cargar_lugares_desde_csv(sincronizar=args.sincronizar, workers=args.workers,
+                             tamanio_lote=args.por_lotes, forzar=args.forzar)
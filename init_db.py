@@ -1,114 +1,185 @@
 """
 Script para inicializar la base de datos y crear usuarios de prueba
+
+Los datos de prueba se insertan por conjuntos (executemany) con claves
+precalculadas, ya que la base está recién creada, y todo en una sola
+transacción.
+
+Con --plantilla, la base sembrada se arma una sola vez en un archivo
+plantilla (plantilla.db) y las siguientes inicializaciones solo la copian
+(únicamente SQLite). La plantilla se rearma sola si cambian el esquema,
+las migraciones, los datos de ejemplo o DEFAULT_PASSWORD.
 """
+import argparse
+import hashlib
+import inspect
+import os
+import shutil
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateTable
+from werkzeug.security import generate_password_hash
 from app import create_app, db
-from app.models import Usuario, Rol, Itinerario, Etapa, Ciudad, Provincia, Aeropuerto, ParqueNacional, LugarInteres
+from app.cache_catalogo import cache_catalogo
+from app.models import Usuario, Rol, Itinerario, Etapa, Ciudad, Provincia
+from app.migraciones import marcar_como_aplicadas, MIGRACIONES
+from app.utils import normalizar_texto
 from data.provincias import provincias_data
-import os
 
-def init_database():
+PLANTILLA_POR_DEFECTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plantilla.db')
+
+
+def sembrar(connection, password):
+    """Crea el esquema y los datos de prueba usando la conexión (una sola transacción)"""
+    # Eliminar todas las tablas existentes (IMPORTANTE: ¡CUIDADO en producción!)
+    print("Eliminando tablas existentes...")
+    db.metadata.drop_all(bind=connection)
+
+    # Crear todas las tablas
+    print("Creando tablas...")
+    db.metadata.create_all(bind=connection)
+
+    # El esquema recién creado ya incluye todas las migraciones
+    marcar_como_aplicadas(connection)
+
+    # Crear roles
+    print("Creando roles...")
+    connection.execute(Rol.__table__.insert(), [
+        {'idRol': 1, 'titulo': 'Administrador'},
+        {'idRol': 2, 'titulo': 'Planificador'},
+    ])
+
+    # Crear usuarios de prueba (por defecto usa DEFAULT_PASSWORD definida en el archivo .env).
+    # Tienen la misma contraseña: el hash, lento a propósito, se calcula una sola vez.
+    print("Creando usuarios de prueba...")
+    hash_password = generate_password_hash(password)
+    connection.execute(Usuario.__table__.insert(), [
+        {'idUsuario': 1, 'idRol': 1, 'nombre': 'Admin', 'apellido': 'Sistema',
+         'email': 'admin@itinerar.com', 'fechaNacimiento': '1990-01-01', 'hashPassword': hash_password},
+        {'idUsuario': 2, 'idRol': 2, 'nombre': 'Juan', 'apellido': 'Planificador',
+         'email': 'planificador@itinerar.com', 'fechaNacimiento': '1992-05-15', 'hashPassword': hash_password},
+    ])
+
+    # Crear las provincias y ciudades de ejemplo con sus ids ya asignados
+    print("Creando provincias y ciudades de ejemplo...")
+    provincias = []
+    ciudades = []
+    for id_provincia, prov_data in enumerate(provincias_data, start=1):
+        provincias.append({'idProvincia': id_provincia, 'nombre': prov_data['nombre'],
+                           'nombreNormalizado': normalizar_texto(prov_data['nombre'])})
+        for ciudad_nombre in prov_data['ciudades']:
+            ciudades.append({'idCiudad': len(ciudades) + 1, 'idProvincia': id_provincia,
+                             'nombre': ciudad_nombre, 'nombreNormalizado': normalizar_texto(ciudad_nombre)})
+    connection.execute(Provincia.__table__.insert(), provincias)
+    connection.execute(Ciudad.__table__.insert(), ciudades)
+
+    # Crear un itinerario de ejemplo
+    print("Creando itinerario de ejemplo...")
+    id_salta = next((c['idCiudad'] for c in ciudades if c['nombre'] == 'Salta'), None)
+    if id_salta:
+        connection.execute(Itinerario.__table__.insert(), [{
+            'idItinerario': 1,
+            'idUsuario': 2,
+            'titulo': 'Norte Argentino en 10 Días',
+            'descripcion': 'Un recorrido por las maravillas del norte argentino',
+            'esPrivado': 0,  # Público
+            'fechaInicio': '2024-12-15',
+            'fechaFin': '2024-12-25',
+        }])
+        connection.execute(Etapa.__table__.insert(), [{
+            'idItinerario': 1,
+            'idCiudad': id_salta,
+            'orden': 1,
+            'actividadDelDia': 'Llegada a Salta. Check-in en hotel y recorrido por el centro histórico.',
+            'fechaInicio': '2024-12-15',
+            'notaPersonal': 'Llevar protector solar y sombrero',
+        }])
+
+
+def firma_semilla(password, dialect):
+    """Firma de lo que determina el contenido de la base sembrada"""
+    partes = [str(CreateTable(tabla).compile(dialect=dialect)) for tabla in db.metadata.sorted_tables]
+    partes.append(repr([version for version, _, _ in MIGRACIONES]))
+    partes.append(repr(provincias_data))
+    partes.append(inspect.getsource(sembrar))
+    partes.append(password or '')
+    return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+def inicializar_desde_plantilla(url, password, plantilla=PLANTILLA_POR_DEFECTO):
+    """Copia la plantilla sembrada en la base de la URL, rearmándola si no está al día.
+
+    url debe ser la del engine configurado (db.engine.url): Flask-SQLAlchemy
+    ya resolvió las rutas SQLite relativas contra app.instance_path.
+    Devuelve False (sin hacer nada) si la base no es un archivo SQLite.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return False
+
+    engine = create_engine(f'sqlite:///{plantilla}.tmp')
+    firma = firma_semilla(password, engine.dialect)
+    ruta_firma = plantilla + '.firma'
+    vigente = False
+    if os.path.exists(plantilla) and os.path.exists(ruta_firma):
+        with open(ruta_firma, encoding='utf-8') as archivo:
+            vigente = archivo.read().strip() == firma
+
+    if vigente:
+        print(f"Usando la plantilla {plantilla}...")
+    else:
+        print(f"Creando la plantilla {plantilla}...")
+        if os.path.exists(f'{plantilla}.tmp'):
+            os.remove(f'{plantilla}.tmp')
+        with engine.begin() as connection:
+            sembrar(connection, password)
+        engine.dispose()
+        os.replace(f'{plantilla}.tmp', plantilla)
+        with open(ruta_firma, 'w', encoding='utf-8') as archivo:
+            archivo.write(firma)
+
+    # Copiar a un temporal y reemplazar, para no dejar una base a medio copiar
+    destino = url.database
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    shutil.copyfile(plantilla, destino + '.tmp')
+    for sufijo in ('-wal', '-shm', '-journal'):
+        if os.path.exists(destino + sufijo):
+            os.remove(destino + sufijo)
+    os.replace(destino + '.tmp', destino)
+    return True
+
+
+def init_database(plantilla=None):
     """Inicializa la base de datos y crea datos de prueba"""
     app = create_app()
-    
+    password = os.getenv('DEFAULT_PASSWORD')
+    inicio = time.perf_counter()
+
     with app.app_context():
-        # Eliminar todas las tablas existentes (IMPORTANTE: ¡CUIDADO en producción!)
-        print("Eliminando tablas existentes...")
-        db.drop_all()
-        
-        # Crear todas las tablas
-        print("Creando tablas...")
-        db.create_all()
-        
-        # Crear roles
-        print("Creando roles...")
-        roles = [
-            Rol(titulo='Administrador'),
-            Rol(titulo='Planificador'),
-        ]
-        for rol in roles:
-            db.session.add(rol)
-        db.session.commit()
-        
-        # Obtener los roles creados
-        rol_admin = Rol.query.filter_by(titulo='Administrador').first()
-        rol_planificador = Rol.query.filter_by(titulo='Planificador').first()
-        
-        # Crear usuarios de prueba
-        print("Creando usuarios de prueba...")
-        usuarios = [
-            Usuario(
-                idRol=rol_admin.idRol,
-                nombre='Admin',
-                apellido='Sistema',
-                email='admin@itinerar.com',
-                fechaNacimiento='1990-01-01'
-            ),
-            Usuario(
-                idRol=rol_planificador.idRol,
-                nombre='Juan',
-                apellido='Planificador',
-                email='planificador@itinerar.com',
-                fechaNacimiento='1992-05-15'
-            )
-        ]
-        
-        # Establecer contraseñas (por defecto usa DEFAULT_PASSWORD definida en el archivo .env)
-        for usuario in usuarios:
-            usuario.set_password(os.getenv('DEFAULT_PASSWORD'))
-            db.session.add(usuario)
-        db.session.commit()
-        
-        # Crear algunas provincias y ciudades de ejemplo
-        print("Creando provincias y ciudades de ejemplo...")
-        
-        for prov_data in provincias_data:
-            provincia = Provincia(nombre=prov_data['nombre'])
-            db.session.add(provincia)
-            db.session.flush()  # Para obtener el idProvincia
-            
-            for ciudad_nombre in prov_data['ciudades']:
-                ciudad = Ciudad(idProvincia=provincia.idProvincia, nombre=ciudad_nombre)
-                db.session.add(ciudad)
-        
-        db.session.commit()
-        
-        # Crear un itinerario de ejemplo
-        print("Creando itinerario de ejemplo...")
-        usuario_planificador = Usuario.query.filter_by(email='planificador@itinerar.com').first()
-        ciudad_salta = Ciudad.query.filter_by(nombre='Salta').first()
-        
-        if usuario_planificador and ciudad_salta:
-            itinerario = Itinerario(
-                idUsuario=usuario_planificador.idUsuario,
-                titulo='Norte Argentino en 10 Días',
-                descripcion='Un recorrido por las maravillas del norte argentino',
-                esPrivado=0,  # Público
-                fechaInicio='2024-12-15',
-                fechaFin='2024-12-25'
-            )
-            db.session.add(itinerario)
-            db.session.flush()
-            
-            # Crear algunas etapas de ejemplo
-            etapa1 = Etapa(
-                idItinerario=itinerario.idItinerario,
-                idCiudad=ciudad_salta.idCiudad,
-                orden=1,
-                actividadDelDia='Llegada a Salta. Check-in en hotel y recorrido por el centro histórico.',
-                fechaInicio='2024-12-15',
-                notaPersonal='Llevar protector solar y sombrero'
-            )
-            db.session.add(etapa1)
-        
-        db.session.commit()
-        
+        copiada = False
+        if plantilla:
+            db.engine.dispose()
+            copiada = inicializar_desde_plantilla(db.engine.url, password, plantilla)
+            if not copiada:
+                print("La plantilla solo se usa con bases SQLite en archivo; se siembra directamente.")
+        if not copiada:
+            with db.engine.begin() as connection:
+                sembrar(connection, password)
+        # El cache del catálogo (en archivo sobrevive al proceso) tiene páginas de la base anterior
+        cache_catalogo.limpiar()
+
         print("\n" + "="*50)
-        print("Base de datos inicializada correctamente!")
+        print(f"Base de datos inicializada correctamente! ({time.perf_counter() - inicio:.2f}s)")
         print("="*50)
         print("\nUsuarios de prueba creados:")
-        print("  - Admin: admin@itinerar.com / " + os.getenv('DEFAULT_PASSWORD'))
-        print("  - Planificador: planificador@itinerar.com / " + os.getenv('DEFAULT_PASSWORD'))
+        print("  - Admin: admin@itinerar.com / " + password)
+        print("  - Planificador: planificador@itinerar.com / " + password)
         print("\n" + "="*50)
 
 if __name__ == '__main__':
-    init_database()
+    parser = argparse.ArgumentParser(description='Inicializa la base de datos con datos de prueba')
+    parser.add_argument('--plantilla', nargs='?', const=PLANTILLA_POR_DEFECTO, default=None, metavar='RUTA',
+                        help='copia la base desde una plantilla ya sembrada (la crea si falta o está vieja)')
+    args = parser.parse_args()
+    init_database(plantilla=args.plantilla)
@@ -0,0 +1,79 @@
+"""
+Fixtures de las pruebas: la app sobre bases SQLite temporales con datos sintéticos
+"""
+import contextlib
+import io
+import pytest
+from sqlalchemy import create_engine, event
+
+PASSWORD = 'pruebas'
+
+# Volúmenes de `flask generar-datos` de la base chica; la grande tiene el doble de cada uno.
+# Con limite=200 cada listado entra en una sola página, así un N+1 cambia la cantidad de consultas.
+VOLUMENES = {'usuarios': 5, 'lugares': 300, 'itinerarios': 40, 'etapas': 120}
+
+
+def _preparar_base(ruta, volumenes):
+    """Crea en ruta una base con los datos de prueba de init_db.py y los volúmenes indicados"""
+    from init_db import sembrar
+    from app.datos_sinteticos import generar_datos
+
+    engine = create_engine(f'sqlite:///{ruta}')
+    with contextlib.redirect_stdout(io.StringIO()), engine.begin() as connection:
+        sembrar(connection, PASSWORD)
+        generar_datos(connection, password=PASSWORD, informar=lambda mensaje: None, **volumenes)
+    engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def apps(tmp_path_factory):
+    """Apps sobre una base con VOLUMENES y otra con el doble, sin cache del catálogo"""
+    from app import create_app
+
+    directorio = tmp_path_factory.mktemp('bases')
+    resultado = {}
+    with pytest.MonkeyPatch.context() as entorno:
+        entorno.setenv('DEFAULT_PASSWORD', PASSWORD)
+        entorno.setenv('CATALOGO_CACHE', 'ninguno')
+        entorno.setenv('DASHBOARD_PRECALCULAR', '0')
+        # Sin construcciones en segundo plano que sumen consultas a las que se cuentan
+        entorno.setenv('AUTOCOMPLETAR_PRECONSTRUIR', '0')
+        for escala, factor in (('N', 1), ('2N', 2)):
+            ruta = directorio / f'{escala}.db'
+            _preparar_base(ruta, {nombre: cantidad * factor for nombre, cantidad in VOLUMENES.items()})
+            entorno.setenv('SQLALCHEMY_DATABASE_URI', f'sqlite:///{ruta}')
+            resultado[escala] = create_app()
+    return resultado
+
+
+def iniciar_sesion(app):
+    """Cliente de pruebas con la sesión del planificador de ejemplo iniciada"""
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'email': 'planificador@itinerar.com', 'password': PASSWORD})
+    return cliente
+
+
+def consultas_por_peticion(app, ruta, cliente=None):
+    """Cantidad de sentencias SQL que ejecuta la petición GET a ruta.
+
+    Antes se hace la misma petición una vez sin contar, para no incluir lo
+    que se consulta solo en la primera (por ejemplo, si hay índice FTS5).
+    """
+    from app import db
+
+    cliente = cliente or app.test_client()
+    assert cliente.get(ruta).status_code == 200
+    with app.app_context():
+        engine = db.engine
+    contador = {'consultas': 0}
+
+    def contar(*_):
+        contador['consultas'] += 1
+
+    event.listen(engine, 'before_cursor_execute', contar)
+    try:
+        respuesta = cliente.get(ruta)
+    finally:
+        event.remove(engine, 'before_cursor_execute', contar)
+    assert respuesta.status_code == 200
+    return contador['consultas']
@@ -0,0 +1,88 @@
+"""
+Consultas SQL por petición: no dependen de la cantidad de filas (sin N+1)
+
+Cada endpoint se pide sobre una base con N filas y otra con 2N; la
+cantidad de sentencias debe ser la misma y no superar el máximo indicado.
+"""
+import pytest
+from app import db
+from app.models import Etapa, Itinerario, LugarInteres
+from tests.conftest import consultas_por_peticion, iniciar_sesion
+
+# (endpoint, ruta, máximo de consultas por petición)
+ENDPOINTS_LISTADOS = [
+    # Sin cache del catálogo (la app de las pruebas usa CATALOGO_CACHE=ninguno)
+    ('itinerarios.listar', '/itinerarios/?limite=200', 2),
+    ('itinerarios.api_publicos', '/itinerarios/api/publicos?limite=200', 2),
+]
+ENDPOINTS_LUGARES = [
+    ('lugares.buscar', '/lugares/api/buscar?nombre=hotel&limite=200', 1),
+    ('lugares.buscar (provincia)', '/lugares/api/buscar?provincia_id={provincia}&categoria=Alojamiento&limite=200', 1),
+    ('lugares.por_provincia', '/lugares/api/por-provincia/{provincia}?limite=200', 1),
+]
+
+
+def _provincia_con_mas_lugares(app):
+    with app.app_context():
+        return (db.session.query(LugarInteres.idProvincia)
+                .group_by(LugarInteres.idProvincia)
+                .order_by(db.func.count().desc(), LugarInteres.idProvincia)
+                .limit(1).scalar())
+
+
+@pytest.mark.parametrize('endpoint, ruta, maximo', ENDPOINTS_LUGARES, ids=[e[0] for e in ENDPOINTS_LUGARES])
+def test_consultas_lugares(apps, endpoint, ruta, maximo):
+    consultas = {}
+    for escala, app in apps.items():
+        consultas[escala] = consultas_por_peticion(app, ruta.format(provincia=_provincia_con_mas_lugares(app)))
+    assert consultas['N'] == consultas['2N'], f'{endpoint}: {consultas}'
+    assert consultas['N'] <= maximo, f'{endpoint}: {consultas}'
+
+
+@pytest.mark.parametrize('endpoint, ruta, maximo', ENDPOINTS_LISTADOS, ids=[e[0] for e in ENDPOINTS_LISTADOS])
+def test_consultas_listados(apps, endpoint, ruta, maximo):
+    consultas = {escala: consultas_por_peticion(app, ruta) for escala, app in apps.items()}
+    assert consultas['N'] == consultas['2N'], f'{endpoint}: {consultas}'
+    assert consultas['N'] <= maximo, f'{endpoint}: {consultas}'
+
+
+def test_consultas_listado_autenticado(apps):
+    # Usuario y rol de la sesión, sus itinerarios, los públicos de otros y el resumen de etapas
+    consultas = {escala: consultas_por_peticion(app, '/itinerarios/?limite=200', iniciar_sesion(app))
+                 for escala, app in apps.items()}
+    assert consultas['N'] == consultas['2N'], consultas
+    assert consultas['N'] <= 5, consultas
+
+
+def test_consultas_detalle(apps):
+    # El itinerario público con más etapas, antes y después de duplicarlas
+    app = apps['N']
+    with app.app_context():
+        id_itinerario, = (db.session.query(Etapa.idItinerario)
+                          .join(Itinerario).filter(Itinerario.esPrivado == 0)
+                          .group_by(Etapa.idItinerario)
+                          .order_by(db.func.count().desc(), Etapa.idItinerario).first())
+        etapas = Etapa.query.filter_by(idItinerario=id_itinerario).all()
+        lugares = db.session.query(LugarInteres.idLugarInteres, LugarInteres.idCiudad).limit(len(etapas)).all()
+    ruta = f'/itinerarios/{id_itinerario}'
+    antes = consultas_por_peticion(app, ruta)
+
+    # Se duplican las etapas, cada copia con otro lugar y otra ciudad
+    with app.app_context():
+        copias = [Etapa(idItinerario=id_itinerario, orden=etapa.orden + 1, idCiudad=id_ciudad,
+                        idLugarInteres=id_lugar, actividadDelDia=etapa.actividadDelDia,
+                        fechaInicio=etapa.fechaInicio)
+                  for etapa, (id_lugar, id_ciudad) in zip(etapas, lugares)]
+        db.session.add_all(copias)
+        db.session.commit()
+        ids_copias = [copia.idEtapa for copia in copias]
+    try:
+        despues = consultas_por_peticion(app, ruta)
+    finally:
+        with app.app_context():
+            Etapa.query.filter(Etapa.idEtapa.in_(ids_copias)).delete(synchronize_session=False)
+            db.session.commit()
+
+    assert len(ids_copias) == len(etapas) > 0
+    assert antes == despues, {'N': antes, '2N': despues}
+    assert antes <= 2, {'N': antes, '2N': despues}